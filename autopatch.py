@@ -1,25 +1,40 @@
 #!/usr/bin/python3
 import argparse
+import json
+import sys
+from tempfile import NamedTemporaryFile
 
 from config import *
-from git import init_git
+from datetime import datetime
+from git import init_git, clone_kernel, remotes
 from langs import _
 from machine import git, Commit, CommitMachine, init_commit
-
-
-def show_logs(commits):
-    print('%-12s %-20s %-20s %-8s %-8s %-6s %-10s %-20s' % (
-        'key',
-        'create date',
-        'update date', 'version',
-        'group', 'order', 'status', 'title',))
-
-    for i in commits:
-        print('%-12s %-20s %-20s v%-7s %-8s %-6s %-10s %-20s' % (
-            i['key'],
-            i['create'],
-            i['update'], i['version'],
-            i['group'], i['order'], i['status'], i['title']))
+from tracer import tracer, env_mode
+import build
+import completion
+import daemon
+import headless
+import inbox
+import logquery
+import overlap
+import prefixes
+import search
+import spelling
+import stats
+import upstream
+import watch
+
+
+def show_logs(commits, args=None):
+    fmt = getattr(args, 'format', None) or 'table'
+    if args is not None:
+        commits = logquery.select(commits, args)
+    try:
+        logquery.write(commits, fmt)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # the reader, such as head, is gone
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
 
 
 class PatchOps:
@@ -49,6 +64,15 @@ class PatchOps:
             'commit': ops.do_commit,
             'log': ops.do_log,
             'send': ops.do_send,
+            'stats': ops.do_stats,
+            'spell': ops.do_spell,
+            'daemon': ops.do_daemon,
+            'build': ops.do_build,
+            'check': ops.do_check,
+            'rebase': ops.do_rebase,
+            'inbox': ops.do_inbox,
+            'watch': ops.do_watch,
+            'repo': ops.do_repo,
         }
         def_ops[m]()
 
@@ -94,10 +118,18 @@ class PatchOps:
         machine.commit = commit
         machine.run()
 
-    @staticmethod
-    def do_log():
-        commits = Commit.get_commits()
-        show_logs(commits)
+    def do_log(self):
+        if self.args.group:
+            commits = Commit.find_group(self.args.group)
+        else:
+            commits = Commit.get_commits()
+        if self.args.search:
+            commits = search.query(self.args.search, commits)
+        try:
+            show_logs(commits, self.args)
+        except ValueError as e:
+            print(e)
+            exit(1)
 
     def do_log_group(self):
         group = self.args.do_log_group
@@ -108,6 +140,8 @@ class PatchOps:
     def do_log_clear():
         Commit.get_commits().clear()
         Commit.store_commit()
+        search.sync([], prune=True)
+        overlap.sync([], prune=True)
 
     def change_log_attr(self, attr, val, key=None):
         if not key:
@@ -122,7 +156,10 @@ class PatchOps:
             print(_('commit.no_continue'))
             return
 
-        commit[attr] = val
+        if attr == 'status':
+            Commit.set_status(commit, val)
+        else:
+            commit[attr] = val
         Commit.store_commit()
 
     def do_change_title(self):
@@ -134,7 +171,6 @@ class PatchOps:
         Commit.update_log()
 
     def do_clone(self):
-        no_content = self.args.no_content
         key = self.args.do_clone
         commit = Commit.find_key(key)
         if not commit:
@@ -144,7 +180,7 @@ class PatchOps:
         machine = CommitMachine(self.args)
         machine.set_start('clone')
         machine.commit = commit
-        machine.run((key, no_content))
+        machine.run()
 
     def do_log_delete(self):
         key = self.args.do_log_delete
@@ -168,7 +204,7 @@ class PatchOps:
 
     def do_send_group(self, group):
         m = CommitMachine(self.args)
-        m.set_start('make_cover')
+        m.set_start('check_series')
         m.run(group)
 
     def do_send_key(self, key):
@@ -193,14 +229,239 @@ class PatchOps:
         else:
             self.do_send_group(group)
 
+    def do_stats(self):
+        data = stats.compute(Commit.get_commits())
+        stats.show(data, self.args.weeks)
+        if self.args.prometheus:
+            stats.write_prometheus(data, self.args.prometheus,
+                                   wconfig.get('id', ''))
+
+    def do_spell(self):
+        kernel = git.git_path
+        words = spelling.load_words(
+            os.path.join(kernel, 'scripts', 'spelling.txt'),
+            os.path.join(wconfig_dir, 'spelling.txt'))
+        if not words:
+            print(_('spell.no_words'))
+            exit(1)
+
+        files = git.git_cmd_str('git ls-files -z -- %s' % ' '.join(
+            '"%s"' % i for i in self.args.paths))
+        files = [i for i in (files or '').split('\0')
+                 if i and i != 'scripts/spelling.txt']
+        hits = spelling.scan(kernel, files, words, self.args.jobs)
+        groups = spelling.group_hits(
+            hits, spelling.Maintainers(os.path.join(kernel, 'MAINTAINERS')))
+
+        for (section, items) in sorted(groups.items()):
+            print('%s (%d)' % (section, len(items)))
+            for (path, line, offset, word, fix) in items:
+                print('  %s:%d: %s ==> %s' % (path, line, word, fix))
+        print(_('spell.summary').format(hits=len(hits), groups=len(groups)))
+
+        if not self.args.commit or not groups:
+            return
+        if git.git_cmd_str('git status --porcelain -uno'):
+            print(_('spell.dirty'))
+            exit(1)
+
+        for (section, items) in sorted(groups.items()):
+            files = sorted(set(i[0] for i in items))
+            spelling.fix_files(kernel, items)
+            tmp = NamedTemporaryFile('w+t')
+            tmp.write(spelling.commit_message(files, items))
+            tmp.flush()
+            code, msg = git.git_cmd('git add -- %s && git commit -q -s -F %s' % (
+                ' '.join('"%s"' % i for i in files), tmp.name))
+            tmp.close()
+            if code != 0:
+                print('ERROR: ' + msg)
+                exit(1)
+
+            commit = Commit.add_commit(git.get_last_title(), git.get_last_sid(),
+                                       0)
+            Commit.save_patch(commit)
+            Commit.set_status(commit, 'set_tag')
+            Commit.store_commit()
+            print('%s %s' % (commit['key'], commit['title']))
+
+    def do_build(self):
+        conf = wconfig.get('build') or {}
+        for key in ['dir', 'jobs', 'config']:
+            val = getattr(self.args, 'build_' + key)
+            if val is not None:
+                conf[key] = val
+        if self.args.build_headers is not None:
+            conf['headers'] = [i for i in self.args.build_headers.split(',')
+                               if i]
+        if self.args.disable:
+            conf['dir'] = ''
+        wconfig['build'] = conf
+        update_wconfig()
+
+        if not self.args.files:
+            print(json.dumps(build.settings(), indent=2))
+            return
+        if not build.enabled():
+            print(_('build.disabled'))
+            exit(1)
+        failed = build.test(self.args.files)
+        for (target, err) in failed:
+            print('%s:\n%s' % (target, err))
+        print(_('commit.build_err') if failed else _('commit.build_ok'))
+        exit(1 if failed else 0)
+
+    def upstream_base(self):
+        ref = self.args.ref or upstream.default_ref()
+        if not ref:
+            print(_('git.invalid_remote'))
+            exit(1)
+        if self.args.fetch and '/' in ref:
+            before = git.rev(ref)
+            code, msg = git.git_cmd('git fetch -q %s' % ref.split('/')[0])
+            if code != 0:
+                print('ERROR: ' + msg)
+                exit(1)
+            git.optimize_later(ref, before)
+        base = upstream.resolve(ref)
+        if not base:
+            print(_('upstream.invalid_ref').format(ref=ref))
+            exit(1)
+        return ref, base
+
+    def upstream_units(self):
+        if self.args.group:
+            commits = Commit.find_group(self.args.group)
+        elif self.args.key:
+            commits = [c for c in [Commit.find_key(self.args.key)] if c]
+        else:
+            commits = Commit.get_commits()
+        return upstream.open_units(commits)
+
+    def do_check(self):
+        if self.args.overlap:
+            self.show_overlap()
+            return
+        ref, base = self.upstream_base()
+        results = upstream.check(base, self.upstream_units(), self.args.jobs)
+        self.show_upstream(ref, results, 'upstream.summary')
+
+    def do_rebase(self):
+        ref, base = self.upstream_base()
+        results = upstream.rebase(base, self.upstream_units(), self.args.jobs)
+        for (c, res, msg) in results:
+            if res in [upstream.CLEAN, upstream.THREE_WAY]:
+                c['update'] = datetime.now()
+                search.update(c)
+                overlap.update(c)
+        Commit.store_commit()
+
+        conflicts = [c for (c, res, msg) in results
+                     if res == upstream.CONFLICT]
+        for c in conflicts:
+            print(_('upstream.conflict').format(key=c['key'],
+                                                title=c['title']))
+        self.show_upstream(ref, results, 'upstream.rebased')
+
+    def show_overlap(self):
+        commits = Commit.get_commits()
+        sets = overlap.overlap_sets(commits)
+        if self.args.group or self.args.key:
+            unit = [overlap.series_of(c) for c in commits
+                    if c['key'] == self.args.key or
+                    (self.args.group and c['group'] == self.args.group)]
+            sets = [i for i in sets if set(unit) & set(i[0])]
+        titles = {overlap.series_of(c): c['title'] for c in commits}
+        for (i, (members, paths)) in enumerate(sets):
+            print(_('upstream.overlap_set').format(index=i + 1,
+                                                   count=len(members)))
+            for s in members:
+                print('    %-20s %s' % (s, '' if s.startswith('group:')
+                                        else titles.get(s, '')))
+            print('    ' + ', '.join(paths))
+        print(_('upstream.overlap_summary').format(count=len(sets)))
+        exit(1 if sets else 0)
+
+    def show_upstream(self, ref, results, summary):
+        counts = {}
+        print('%-12s %-11s %-8s %s' % ('key', 'result', 'group', 'title'))
+        for (c, res, msg) in results:
+            counts[res] = counts.get(res, 0) + 1
+            print('%-12s %-11s %-8s %s' % (c['key'], res, c['group'],
+                                          c['title']))
+            if self.args.verbose and msg:
+                print('\n'.join('    ' + i for i in msg.splitlines()))
+        print(_(summary).format(ref=ref, count=len(results)) +
+              ', '.join('%s: %d' % i for i in sorted(counts.items())))
+        exit(1 if upstream.CONFLICT in counts else 0)
+
+    def do_inbox(self):
+        if self.args.reset and os.path.exists(inbox.state_file):
+            os.remove(inbox.state_file)
+        sources = wconfig.setdefault('inbox', [])
+        for i in self.args.sources:
+            i = os.path.abspath(i)
+            i not in sources and sources.append(i)
+        if not sources:
+            print(_('inbox.no_source'))
+            exit(1)
+
+        tracker = inbox.Tracker(Commit.get_commits())
+        for i in sources:
+            tracker.refresh(i, Commit.store_commit)
+        for (key, added) in tracker.added.items():
+            print('%s %s' % (key, tracker.commits[key]['title']))
+            print('\n'.join('    ' + i for i in added))
+        print(_('inbox.summary').format(count=tracker.count,
+                                        replies=tracker.replies,
+                                        patches=len(tracker.added)))
+
+    def do_repo(self):
+        if self.args.repo_action == 'prefix':
+            print(_('repo.prefix_updated').format(
+                count=prefixes.update() or 0))
+            for (prefix, score) in prefixes.suggest(self.args.paths)[:5]:
+                print('%3d%%  %s' % (score * 100, prefix))
+            return
+        if self.args.repo_action == 'fast-status':
+            wconfig['fast_status'] = git.setup_fast_status()
+            update_wconfig()
+            print(_('repo.fast_status').format(**wconfig['fast_status']))
+            return
+        code, msg = git.optimize()
+        print(msg) if code != 0 else print(_('repo.optimized'))
+        print(_('repo.prefix_updated').format(count=prefixes.update() or 0))
+        exit(code)
+
+    def do_watch(self):
+        watch.run(self.args.poll, self.args.once, self.args.debounce)
+
+    def do_daemon(self):
+        if self.args.stop:
+            daemon.stop()
+            return
+        daemon.Daemon(run_argv).serve()
+
     def do_patch(self):
         m = CommitMachine(self.args)
         m.set_start('import_patch')
         m.run()
 
 
-def parse_args():
+def make_parser():
     parser = argparse.ArgumentParser(prog='autopatch.py')
+    parser.add_argument('--trace', help=_('args.trace'),
+                        dest='trace', action='store_true',
+                        required=False)
+    parser.add_argument('--profile', help=_('args.profile'),
+                        dest='profile', action='store_true',
+                        required=False)
+    parser.add_argument('--ui', help=_('args.ui'),
+                        dest='ui', choices=['dialog', 'ansi'],
+                        required=False)
+    parser.add_argument('--daemon', help=_('args.daemon'),
+                        dest='daemon', action='store_true',
+                        required=False)
 
     sub_parser = parser.add_subparsers(description=_('args.usage'))
     commit_parser = sub_parser.add_parser('commit', help=_('args.commit'))
@@ -220,6 +481,13 @@ def parse_args():
                                required=False)
     commit_parser.add_argument('--patch', help=_('args.import-patch'),
                                dest='do_patch', required=False, metavar='patch')
+    commit_parser.add_argument('--edit', help=_('args.import-edit'),
+                               dest='edit', action='store_true',
+                               required=False)
+    commit_parser.add_argument('--no-build', help=_('args.no-build'),
+                               dest='no_build', action='store_true',
+                               required=False)
+    headless.add_args(commit_parser)
 
     send_parser = sub_parser.add_parser('send', help=_('args.send'))
     send_parser.set_defaults(action=('send', PatchOps.dispatch))
@@ -229,9 +497,145 @@ def parse_args():
     send_parser.add_argument('-g', '--group', help=_('args.log.group'),
                              dest='group', metavar='group',
                              required=False)
+    send_parser.add_argument('--no-build', help=_('args.send.no-build'),
+                             dest='no_build', action='store_true',
+                             required=False)
+    headless.add_args(send_parser)
+
+    stats_parser = sub_parser.add_parser('stats', help=_('args.stats'))
+    stats_parser.set_defaults(action=('stats', PatchOps.dispatch))
+    stats_parser.add_argument('-w', '--weeks', help=_('args.stats.weeks'),
+                              dest='weeks', metavar='weeks', type=int,
+                              default=12, required=False)
+    stats_parser.add_argument('--prometheus', help=_('args.stats.prometheus'),
+                              dest='prometheus', metavar='file',
+                              required=False)
+
+    spell_parser = sub_parser.add_parser('spell', help=_('args.spell'))
+    spell_parser.set_defaults(action=('spell', PatchOps.dispatch))
+    spell_parser.add_argument('paths', help=_('args.spell.paths'),
+                              nargs='*', metavar='path')
+    spell_parser.add_argument('-j', '--jobs', help=_('args.spell.jobs'),
+                              dest='jobs', type=int, metavar='jobs',
+                              required=False)
+    spell_parser.add_argument('--commit', help=_('args.spell.commit'),
+                              dest='commit', action='store_true',
+                              required=False)
+
+    build_parser = sub_parser.add_parser('build', help=_('args.build'))
+    build_parser.set_defaults(action=('build', PatchOps.dispatch))
+    build_parser.add_argument('files', help=_('args.build.files'),
+                              nargs='*', metavar='file')
+    build_parser.add_argument('--dir', help=_('args.build.dir'),
+                              dest='build_dir', metavar='dir',
+                              required=False)
+    build_parser.add_argument('-j', '--jobs', help=_('args.build.jobs'),
+                              dest='build_jobs', type=int, metavar='jobs',
+                              required=False)
+    build_parser.add_argument('--headers', help=_('args.build.headers'),
+                              dest='build_headers', metavar='targets',
+                              required=False)
+    build_parser.add_argument('--config', help=_('args.build.config'),
+                              dest='build_config', metavar='target',
+                              required=False)
+    build_parser.add_argument('--disable', help=_('args.build.disable'),
+                              dest='disable', action='store_true',
+                              required=False)
+
+    check_parser = sub_parser.add_parser('check', help=_('args.check'))
+    check_parser.set_defaults(action=('check', PatchOps.dispatch))
+    check_parser.add_argument('-r', '--ref', help=_('args.check.ref'),
+                              dest='ref', metavar='ref', required=False)
+    check_parser.add_argument('--fetch', help=_('args.check.fetch'),
+                              dest='fetch', action='store_true',
+                              required=False)
+    check_parser.add_argument('-g', '--group', help=_('args.log.group'),
+                              dest='group', metavar='group',
+                              required=False)
+    check_parser.add_argument('-k', '--key', help=_('args.key'),
+                              dest='key', metavar='key', required=False)
+    check_parser.add_argument('-j', '--jobs', help=_('args.spell.jobs'),
+                              dest='jobs', type=int, metavar='jobs',
+                              required=False)
+    check_parser.add_argument('-v', '--verbose', help=_('args.check.verbose'),
+                              dest='verbose', action='store_true',
+                              required=False)
+    check_parser.add_argument('--overlap', help=_('args.check.overlap'),
+                              dest='overlap', action='store_true',
+                              required=False)
+
+    rebase_parser = sub_parser.add_parser('rebase', help=_('args.rebase'))
+    rebase_parser.set_defaults(action=('rebase', PatchOps.dispatch))
+    rebase_parser.add_argument('-r', '--ref', help=_('args.rebase.ref'),
+                               dest='ref', metavar='ref', required=False)
+    rebase_parser.add_argument('--fetch', help=_('args.check.fetch'),
+                               dest='fetch', action='store_true',
+                               required=False)
+    rebase_parser.add_argument('-g', '--group', help=_('args.log.group'),
+                               dest='group', metavar='group',
+                               required=False)
+    rebase_parser.add_argument('-k', '--key', help=_('args.key'),
+                               dest='key', metavar='key', required=False)
+    rebase_parser.add_argument('-j', '--jobs', help=_('args.spell.jobs'),
+                               dest='jobs', type=int, metavar='jobs',
+                               required=False)
+    rebase_parser.add_argument('-v', '--verbose',
+                               help=_('args.check.verbose'),
+                               dest='verbose', action='store_true',
+                               required=False)
+
+    inbox_parser = sub_parser.add_parser('inbox', help=_('args.inbox'))
+    inbox_parser.set_defaults(action=('inbox', PatchOps.dispatch))
+    inbox_parser.add_argument('sources', help=_('args.inbox.sources'),
+                              nargs='*', metavar='source')
+    inbox_parser.add_argument('--reset', help=_('args.inbox.reset'),
+                              dest='reset', action='store_true',
+                              required=False)
+
+    completion_parser = sub_parser.add_parser('completion',
+                                              help=_('args.completion'))
+    completion_parser.set_defaults(action=('completion', None))
+    completion_parser.add_argument('shell', choices=completion.shells,
+                                   help=_('args.completion.shell'))
+
+    repo_parser = sub_parser.add_parser('repo', help=_('args.repo'))
+    repo_parser.set_defaults(action=('repo', PatchOps.dispatch))
+    repo_parser.add_argument('repo_action', choices=['optimize', 'prefix',
+                                                      'fast-status'],
+                             help=_('args.repo.action'))
+    repo_parser.add_argument('paths', nargs='*', metavar='path',
+                             help=_('args.repo.paths'))
+
+    watch_parser = sub_parser.add_parser('watch', help=_('args.watch'))
+    watch_parser.set_defaults(action=('watch', PatchOps.dispatch))
+    watch_parser.add_argument('--poll', help=_('args.watch.poll'),
+                              dest='poll', action='store_true',
+                              required=False)
+    watch_parser.add_argument('--once', help=_('args.watch.once'),
+                              dest='once', action='store_true',
+                              required=False)
+    watch_parser.add_argument('--debounce', help=_('args.watch.debounce'),
+                              dest='debounce', metavar='seconds',
+                              type=float, required=False)
+
+    daemon_parser = sub_parser.add_parser('daemon', help=_('args.daemon-cmd'))
+    daemon_parser.set_defaults(action=('daemon', PatchOps.dispatch))
+    daemon_parser.add_argument('--stop', help=_('args.daemon.stop'),
+                               dest='stop', action='store_true',
+                               required=False)
 
     init_parser = sub_parser.add_parser('init', help=_('args.init'))
     init_parser.set_defaults(action=('init', None))
+    init_parser.add_argument('--clone', help=_('args.init.clone'),
+                             dest='clone', metavar='dir', required=False)
+    init_parser.add_argument('--remote', help=_('args.init.remote').format(
+        remotes=', '.join(remotes)), dest='remote', metavar='remote',
+                             default='linux-next', required=False)
+    init_parser.add_argument('--sparse', help=_('args.init.sparse'),
+                             dest='sparse', metavar='dirs', required=False)
+    init_parser.add_argument('--full', help=_('args.init.full'),
+                             dest='full', action='store_true',
+                             required=False)
 
     log_parser = sub_parser.add_parser('log', help=_('args.log'))
     log_parser.set_defaults(action=('log', PatchOps.dispatch))
@@ -241,6 +645,39 @@ def parse_args():
     log_parser.add_argument('-k', '--key', help=_('args.key'),
                             dest='key', metavar='key',
                             required=False)
+    log_parser.add_argument('-s', '--status', help=_('args.log.status'),
+                            dest='status', metavar='status',
+                            required=False)
+    log_parser.add_argument('--since', help=_('args.log.since'),
+                            dest='since', metavar='date',
+                            required=False)
+    log_parser.add_argument('--until', help=_('args.log.until'),
+                            dest='until', metavar='date',
+                            required=False)
+    log_parser.add_argument('-v', '--version', help=_('args.log.version'),
+                            dest='version', metavar='version', type=int,
+                            required=False)
+    log_parser.add_argument('-t', '--title', help=_('args.log.title'),
+                            dest='title', metavar='regex',
+                            required=False)
+    log_parser.add_argument('--search', help=_('args.log.search'),
+                            dest='search', metavar='expr',
+                            required=False)
+    log_parser.add_argument('--sort', help=_('args.log.sort'),
+                            dest='sort', choices=logquery.sort_keys,
+                            required=False)
+    log_parser.add_argument('--desc', help=_('args.log.desc'),
+                            dest='desc', action='store_true',
+                            required=False)
+    log_parser.add_argument('--limit', help=_('args.log.limit'),
+                            dest='limit', metavar='n', type=int,
+                            required=False)
+    log_parser.add_argument('--offset', help=_('args.log.offset'),
+                            dest='offset', metavar='n', type=int,
+                            required=False)
+    log_parser.add_argument('-f', '--format', help=_('args.log.format'),
+                            dest='format', choices=logquery.formats,
+                            default='table', required=False)
     log_parser.add_argument('-i', '--import', help=_('args.log.import'),
                             dest='do_log_import', action='store_true',
                             required=False)
@@ -272,23 +709,68 @@ def parse_args():
                             dest='do_new_version', metavar='key',
                             required=False)
 
-    parsed_args = parser.parse_args()
-    if not parsed_args.__dict__:
+    return parser
+
+
+def parse_args(argv=None):
+    parser = make_parser()
+    parsed_args = parser.parse_args(argv)
+    if 'action' not in parsed_args.__dict__:
         parser.print_help()
         exit(0)
 
     return parsed_args
 
 
-new_user = init_user()
+def run_argv(argv):
+    """
+    run a command for a client of the daemon
+    """
+    user_args = parse_args(argv)
+    user_args.answers_data = None
+    (user_action, user_func) = user_args.action
+    user_func(user_args, user_action)
+
+
+set_headless(headless.detect())
+setup_ui()
+# the completion script needs the parser only: it is eval'ed by the shell
+# rc, where the questions to a new user must not show up
+load_user()
 args = parse_args()
 (action, func) = args.action
+if action == 'completion':
+    sys.stdout.write(completion.script(make_parser(), args.shell))
+    exit(0)
 
-new_workspace = init_workspace()
+new_user = init_user()
+args.answers_data = headless.load(args)
+setup_ui(args.ui)
+
+trace_mode = env_mode()
+if args.trace or args.profile or trace_mode:
+    tracer.enable(os.path.join(wconfig_dir, 'trace'),
+                  args.profile or trace_mode == 'profile')
+
+if not tracer.enabled and daemon.enabled(args) and daemon.served(args):
+    res = daemon.run(sys.argv[1:])
+    if res is not None:
+        sys.stdout.write(res[1])
+        exit(res[0])
+
+kernel = None
+if action == 'init' and args.clone:
+    kernel = clone_kernel(args.clone, args.remote, args.sparse and [
+        i for i in args.sparse.split(',') if i], args.full)
+    if not kernel:
+        print(_('init.clone_err'))
+        exit(1)
+
+new_workspace = init_workspace(kernel)
 
 if action == 'init':
     not new_user and setup_lang()
-    not new_workspace and setup_kernel()
+    not new_workspace and setup_kernel(kernel)
 
 init_git()
 init_commit()
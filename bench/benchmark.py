@@ -0,0 +1,511 @@
+#!/usr/bin/python3
+"""
+Benchmark the main autopatch flows against a synthetic kernel repository.
+
+Everything autopatch talks to is generated in a scratch directory: a git
+repository with a kernel-like layout and a MAINTAINERS file, stub
+scripts/checkpatch.pl and scripts/get_maintainer.pl, a stub
+'git send-email', and stub 'dialog', 'vim' and editor programs that
+accept the default answer of every widget. Workspaces are generated with
+the requested number of commit records and a patch group of the requested
+size, then each flow is run as a separate autopatch process and timed.
+
+    python3 bench/benchmark.py -o before.json
+    python3 bench/benchmark.py --records 10,1000 --groups 5 \\
+        --compare before.json
+
+History queries, such as 'log -u', are measured with a long history and
+then with the kernel repo optimized:
+
+    python3 bench/benchmark.py --history 200000 --flows log_update \\
+        -o history.json
+    python3 bench/benchmark.py --history 200000 --flows log_update \\
+        --optimize --compare history.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+autopatch = os.path.join(os.path.dirname(bench_dir), 'autopatch.py')
+
+subsystems = [
+    ('NETWORKING [GENERAL]', 'netdev@vger.kernel.org',
+     ['net/core', 'net/ipv4', 'net/ipv6', 'include/net']),
+    ('INTEL ETHERNET DRIVERS', 'intel-wired-lan@lists.osuosl.org',
+     ['drivers/net/ethernet/intel']),
+    ('DRM DRIVERS', 'dri-devel@lists.freedesktop.org',
+     ['drivers/gpu/drm']),
+    ('EXT4 FILE SYSTEM', 'linux-ext4@vger.kernel.org', ['fs/ext4']),
+    ('MEMORY MANAGEMENT', 'linux-mm@kvack.org', ['mm']),
+    ('SCHEDULER', 'linux-kernel@vger.kernel.org', ['kernel/sched']),
+    ('BPF', 'bpf@vger.kernel.org', ['kernel/bpf', 'include/linux/bpf']),
+]
+
+stub_dialog = r'''#!/usr/bin/env python3
+# Answer every dialog widget with its default value.
+import os
+import shlex
+import sys
+
+argv = sys.argv[1:]
+if argv[:1] == ['--file']:
+    with open(argv[1]) as f:
+        argv = shlex.split(f.read()) + argv[2:]
+argv = [a for a in argv if a != '--']
+out = sys.stderr
+ok = int(os.environ.get('DIALOG_OK', 0))
+
+if '--print-version' in argv:
+    out.write('Version: 1.3-20201126\n')
+    sys.exit(ok)
+if '--print-maxsize' in argv:
+    out.write('MaxSize: 50, 200\n')
+    sys.exit(ok)
+
+widgets = ['--menu', '--checklist', '--form', '--editbox', '--inputbox']
+pos = [i for i in range(len(argv)) if argv[i] in widgets]
+if pos:
+    w, args = argv[pos[0]], argv[pos[0] + 1:]
+    if w == '--menu':
+        out.write(args[4])
+    elif w == '--checklist':
+        items = [args[i:i + 3] for i in range(4, len(args), 3)]
+        on = [i[0] for i in items if i[2] == 'on'] or [items[0][0]]
+        out.write(''.join(i + '\n' for i in on))
+    elif w == '--form':
+        out.write(''.join(args[i + 3] + '\n'
+                          for i in range(4, len(args), 8)))
+    elif w == '--editbox':
+        with open(args[0]) as f:
+            out.write(f.read())
+    elif w == '--inputbox':
+        out.write(args[3] if len(args) > 3 else '')
+sys.exit(ok)
+'''
+
+stub_vim = '''#!/bin/sh
+# cover letters start empty, patches are only "reviewed"
+[ -s "$1" ] || echo "bench: synthetic series" > "$1"
+'''
+
+stub_editor = '''#!/bin/sh
+printf 'bench: update synthetic code\\n\\nSynthetic change made by the benchmark.\\n' > "$1"
+'''
+
+stub_send_email = '''#!/bin/sh
+echo "$@" >> "$BENCH_ROOT/sent.log"
+'''
+
+stub_sendmail = '''#!/bin/sh
+cat > /dev/null
+'''
+
+stub_checkpatch = '''#!/bin/sh
+echo "total: 0 errors, 0 warnings"
+'''
+
+stub_get_maintainer = '''#!/bin/sh
+echo "Jane Maintainer <jane@example.org> (maintainer:NETWORKING [GENERAL])"
+echo "John Reviewer <john@example.org> (reviewer:NETWORKING [GENERAL])"
+echo "netdev@vger.kernel.org (open list:NETWORKING [GENERAL])"
+'''
+
+c_body = '''// SPDX-License-Identifier: GPL-2.0
+#include <linux/kernel.h>
+#include <linux/module.h>
+
+static int %(name)s_counter;
+
+'''
+
+c_func = '''int %(name)s_func%(i)d(int value)
+{
+	if (value < 0)
+		return -EINVAL;
+
+	%(name)s_counter += value;
+	return %(name)s_counter;
+}
+
+'''
+
+
+def run(cmd, cwd, env=None, check=True):
+    p = subprocess.run(cmd, cwd=cwd, env=env, shell=isinstance(cmd, str),
+                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                       universal_newlines=True)
+    if check and p.returncode != 0:
+        raise RuntimeError('%s failed:\n%s' % (cmd, p.stdout))
+    return p.stdout.strip()
+
+
+def write(path, data, mode=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w+') as f:
+        f.write(data)
+    mode and os.chmod(path, mode)
+
+
+class Bench:
+
+    def __init__(self, root, opts):
+        self.root = root
+        self.opts = opts
+        self.bin = os.path.join(root, 'bin')
+        self.home = os.path.join(root, 'home')
+        self.origin = os.path.join(root, 'origin.git')
+        self.kernel = os.path.join(root, 'kernel')
+        self.env = dict(os.environ)
+        self.env.update({
+            'PATH': self.bin + os.pathsep + os.environ['PATH'],
+            'HOME': self.home,
+            'BENCH_ROOT': root,
+            'GIT_EDITOR': os.path.join(self.bin, 'editor'),
+            'EDITOR': os.path.join(self.bin, 'editor'),
+            'GIT_AUTHOR_NAME': 'Bench User',
+            'GIT_AUTHOR_EMAIL': 'bench@example.org',
+            'GIT_COMMITTER_NAME': 'Bench User',
+            'GIT_COMMITTER_EMAIL': 'bench@example.org',
+            'TERM': 'dumb',
+        })
+        self.env.pop('AUTOPATCH_TRACE', None)
+
+    def git(self, cmd, check=True):
+        return run('git ' + cmd, self.kernel, self.env, check)
+
+    def setup_stubs(self):
+        stubs = {
+            'dialog': stub_dialog,
+            'vim': stub_vim,
+            'editor': stub_editor,
+            'git-send-email': stub_send_email,
+            'sendmail': stub_sendmail,
+            'clear': '#!/bin/sh\n',
+        }
+        for (name, data) in stubs.items():
+            write(os.path.join(self.bin, name), data, 0o755)
+        write(os.path.join(self.home, '.autopatch', 'autopatch.conf'),
+              json.dumps({'lang': 'en'}))
+
+    def setup_kernel(self):
+        random.seed(0)
+        src = os.path.join(self.root, 'src')
+        os.makedirs(src)
+        run('git init -q -b master', src, self.env)
+
+        maintainers = ['List of maintainers\n', '\n']
+        files_per_dir = max(1, self.opts.files // sum(
+            len(s[2]) for s in subsystems))
+        for (name, mail, dirs) in subsystems:
+            maintainers.append('%s\nM:\tJane Maintainer <jane@example.org>\n'
+                               'L:\t%s\nS:\tMaintained\n' % (name, mail))
+            for d in dirs:
+                maintainers.append('F:\t%s/\n' % d)
+                for i in range(files_per_dir):
+                    base = '%s_%d' % (os.path.basename(d), i)
+                    ext = '.h' if d.startswith('include') else '.c'
+                    data = c_body % {'name': base} + ''.join(
+                        c_func % {'name': base, 'i': j}
+                        for j in range(random.randint(5, 30)))
+                    write(os.path.join(src, d, base + ext), data)
+            maintainers.append('\n')
+
+        write(os.path.join(src, 'MAINTAINERS'), ''.join(maintainers))
+        write(os.path.join(src, 'scripts', 'checkpatch.pl'),
+              stub_checkpatch, 0o755)
+        write(os.path.join(src, 'scripts', 'get_maintainer.pl'),
+              stub_get_maintainer, 0o755)
+        write(os.path.join(src, 'Makefile'), 'VERSION = 6\n')
+        run('git add . && git commit -q -m "Linux 6.0"', src, self.env)
+        self.history(src)
+
+        run('git clone -q --bare %s %s' % (src, self.origin), self.root,
+            self.env)
+        run('git clone -q %s %s' % (self.origin, self.kernel), self.root,
+            self.env)
+        shutil.rmtree(src)
+        self.git('config sendemail.smtpServer %s' %
+                 os.path.join(self.bin, 'sendmail'))
+        self.git('config sendemail.confirm never')
+        self.git('config user.name "Bench User"')
+        self.git('config user.email bench@example.org')
+        self.base = self.git('rev-parse HEAD')
+
+    def history(self, src):
+        """
+        add opts.history commits by other developers, spread over the last
+        two years, with git fast-import
+        """
+        count = self.opts.history
+        if not count:
+            return
+        dirs = [d for (name, mail, ds) in subsystems for d in ds]
+        now = int(time.time())
+        step = 730 * 86400 // count
+        lines = []
+        for i in range(count):
+            t = now - (count - i) * step
+            who = 'Dev %d <dev%d@example.org> %d +0000' % (i % 97, i % 97, t)
+            msg = '%s: history change %d\n' % (
+                os.path.basename(dirs[i % len(dirs)]), i)
+            data = 'int history_%d;\n' % i
+            lines.append('commit refs/heads/master\nauthor %s\n'
+                         'committer %s\ndata %d\n%s' % (who, who, len(msg),
+                                                         msg))
+            i == 0 and lines.append('from refs/heads/master^0\n')
+            lines.append('M 100644 inline %s/history_%d.c\ndata %d\n%s\n' % (
+                random.choice(dirs), i % 500, len(data), data))
+        p = subprocess.run(['git', 'fast-import', '--quiet'], cwd=src,
+                           env=self.env, input=''.join(lines),
+                           universal_newlines=True)
+        if p.returncode != 0:
+            raise RuntimeError('git fast-import failed')
+        run('git reset -q --hard', src, self.env)
+
+    def files(self):
+        data = self.git('ls-files -- "*.c"').splitlines()
+        data.sort()
+        return data
+
+    def change(self, path, tag):
+        with open(os.path.join(self.kernel, path), 'a') as f:
+            f.write('int bench_%s(void)\n{\n\treturn 0;\n}\n' % tag)
+
+    def reset(self, ref):
+        self.git('checkout -q -f -B master %s' % ref)
+        self.git('branch -q --set-upstream-to=origin/master')
+        self.git('clean -fdq')
+
+    def setup_workspace(self, records, group):
+        ws = os.path.join(self.root, 'ws-%d-%d' % (records, group))
+        patch_dir = os.path.join(ws, 'patch')
+        os.makedirs(patch_dir)
+        files = self.files()
+
+        # real patches: one single patch and one group on top of base
+        self.reset(self.base)
+        commits = []
+        self.change(files[0], 'single')
+        self.git('commit -q -a -s -m "bench: single change"')
+        single = self.git('format-patch -1 -o %s' % patch_dir)
+        commits.append(self.record('bench: single change',
+                                   os.path.basename(single)))
+
+        self.reset(self.base)
+        for i in range(group):
+            self.change(files[(i + 1) % len(files)], 'group%d' % i)
+            self.git('commit -q -a -s -m "bench: group change %d"' % i)
+            p = self.git('format-patch -1 -o %s' % patch_dir)
+            os.rename(p, os.path.join(patch_dir, 'g%d-%s' % (
+                group, os.path.basename(p))))
+            commits.append(self.record(
+                'bench: group change %d' % i,
+                'g%d-%s' % (group, os.path.basename(p)),
+                'bench', i + 1))
+        self.group_tip = self.git('rev-parse HEAD')
+
+        # synthetic history, without patch files
+        now = datetime.now()
+        statuses = ['re_commit', 'set_tag', 'finish', 'applied']
+        for i in range(records - len(commits)):
+            t = now - timedelta(minutes=i * 37)
+            commits.insert(0, self.record(
+                'synthetic: change number %d' % i,
+                '0001-synthetic-change-number-%d.patch' % i,
+                'g%d' % (i // 5) if i % 3 == 0 else 0, i % 5 + 1,
+                random.choice(statuses), t))
+
+        write(os.path.join(ws, '.autopatch', 'default.conf'), json.dumps({
+            'kernel': self.kernel,
+            'id': 'bench-%d-%d' % (records, group),
+            'commits': commits,
+            'test_email': 'test@example.org',
+        }))
+        self.single_key = commits[-group - 1]['key']
+        self.group_key = commits[-1]['key']
+        return ws
+
+    @staticmethod
+    def record(title, patch, group=0, order=0, status='re_commit', t=None):
+        t = (t or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+        return {
+            'title': title,
+            'key': '%012x' % random.getrandbits(48),
+            'create': t,
+            'update': t,
+            'patch': patch,
+            'version': 1,
+            'parent': '',
+            'group': group,
+            'order': order,
+            'status': status,
+            'events': [[t, status, 1]],
+        }
+
+    def flows(self):
+        """
+        name -> (prepare, autopatch arguments)
+        """
+        files = self.files()
+
+        def at_base():
+            self.reset(self.base)
+
+        def at_group():
+            self.reset(self.group_tip)
+
+        def edited():
+            self.reset(self.base)
+            self.change(files[-1], 'commit')
+
+        flows = {}
+        if self.opts.optimize:
+            flows['repo_optimize'] = (None, ['repo', 'optimize'])
+        flows.update({
+            'log': (None, ['log']),
+            'log_update': (None, ['log', '-u']),
+            'restore': (at_base, ['log', '-r', self.group_key]),
+            'commit': (edited, ['commit']),
+            'send_group': (at_group, ['send', '-g', 'bench']),
+            'clone': (at_base, ['log', '--clone', self.single_key]),
+            'export': (None, ['log', '-o', '-g', 'bench']),
+            'import': (None, ['log', '-i']),
+        })
+        return flows
+
+    def time_flow(self, ws, prepare, args):
+        runs = []
+        for i in range(self.opts.repeat):
+            prepare and prepare()
+            start = time.perf_counter()
+            p = subprocess.run([sys.executable, autopatch] + args, cwd=ws,
+                               env=self.env, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT,
+                               universal_newlines=True)
+            runs.append(time.perf_counter() - start)
+            if p.returncode != 0:
+                return runs, p.stdout[-2000:]
+        return runs, None
+
+    def run(self):
+        self.setup_stubs()
+        self.setup_kernel()
+        results = []
+        selected = self.opts.flows.split(',') if self.opts.flows else None
+
+        for records in self.opts.records:
+            for group in self.opts.groups:
+                ws = self.setup_workspace(records, group)
+                for (name, (prepare, args)) in self.flows().items():
+                    if selected and name not in selected:
+                        continue
+                    runs, err = self.time_flow(ws, prepare, args)
+                    runs.sort()
+                    item = {
+                        'flow': name,
+                        'records': records,
+                        'group': group,
+                        'runs': runs,
+                        'min': runs[0],
+                        'median': runs[len(runs) // 2],
+                    }
+                    if err:
+                        item['error'] = err
+                    results.append(item)
+                    print('%-12s records=%-7d group=%-3d median %8.3fs%s' % (
+                        name, records, group, item['median'],
+                        '  FAILED' if err else ''), file=sys.stderr)
+                shutil.rmtree(ws)
+        return results
+
+
+def report_meta(opts):
+    rev = subprocess.getoutput('cd %s && git rev-parse --short HEAD' %
+                               os.path.dirname(autopatch))
+    return {
+        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'autopatch': rev,
+        'git': subprocess.getoutput('git --version'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'files': opts.files,
+        'repeat': opts.repeat,
+        'history': opts.history,
+        'optimize': opts.optimize,
+    }
+
+
+def compare(results, path):
+    with open(path) as f:
+        base = json.load(f)
+    index = {(r['flow'], r['records'], r['group']): r
+             for r in base['results']}
+    print('%-12s %8s %6s %10s %10s %8s' % (
+        'flow', 'records', 'group', 'base(s)', 'now(s)', 'change'))
+    for r in results:
+        b = index.get((r['flow'], r['records'], r['group']))
+        if not b:
+            continue
+        print('%-12s %8d %6d %10.3f %10.3f %+7.1f%%' % (
+            r['flow'], r['records'], r['group'], b['median'], r['median'],
+            (r['median'] / b['median'] - 1) * 100 if b['median'] else 0))
+
+
+def int_list(s):
+    return [int(i) for i in s.split(',') if i]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='benchmark.py')
+    parser.add_argument('--records', type=int_list, default='10,1000,100000',
+                        help='numbers of commit records in the workspace')
+    parser.add_argument('--groups', type=int_list, default='1,10,50',
+                        help='numbers of patches in the benchmarked group')
+    parser.add_argument('--files', type=int, default=2000,
+                        help='number of source files in the synthetic kernel')
+    parser.add_argument('--history', type=int, default=0,
+                        help='number of commits by other developers in the '
+                             'history of the synthetic kernel')
+    parser.add_argument('--optimize', action='store_true',
+                        help="run 'autopatch repo optimize' before the "
+                             "other flows")
+    parser.add_argument('--flows', help='comma separated flows to run')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs of every flow, the median is reported')
+    parser.add_argument('-o', '--output', help='write the JSON report here')
+    parser.add_argument('--compare', metavar='report',
+                        help='compare with a previous JSON report')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the scratch directory')
+    opts = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='autopatch-bench-')
+    try:
+        results = Bench(root, opts).run()
+    finally:
+        if opts.keep:
+            print('scratch directory: %s' % root, file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {'meta': report_meta(opts), 'results': results}
+    if opts.output:
+        with open(opts.output, 'w+') as f:
+            f.write(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    opts.compare and compare(results, opts.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+from config import wconfig, wconfig_dir
+from git import git, GitHelper
+
+defaults = {
+    # output directory of the build, passed to make as O=
+    'dir': '',
+    # make -j
+    'jobs': os.cpu_count() or 1,
+    # targets built when a header is touched, such as 'net/ipv4/'
+    'headers': [],
+    # make target creating the .config when the build dir has none
+    'config': 'defconfig',
+}
+
+
+def settings():
+    conf = dict(defaults)
+    conf.update(wconfig.get('build') or {})
+    return conf
+
+
+def enabled():
+    return bool(settings()['dir'])
+
+
+def diff_files(data):
+    """
+    :return: the files touched by a diff, without the deleted ones, which
+             have nothing left to build
+    """
+    files = set()
+    for block in re.split(r'^(?=diff --git )', data, flags=re.M):
+        m = re.match(r'^diff --git a/\S+ b/(\S+)$', block, re.M)
+        if m and not re.search(r'^deleted file mode ', block, re.M):
+            files.add(m.group(1))
+    return sorted(files)
+
+
+def patch_files(patch):
+    """
+    :return: the files touched by a patch file
+    """
+    with open(patch, 'r', errors='replace') as f:
+        return diff_files(f.read())
+
+
+def dependents(headers, out_dir):
+    """
+    the objects of the build dir which include one of the headers, from the
+    dependencies kbuild records in the .*.o.cmd files
+    """
+    if not headers or not out_dir or not os.path.isdir(out_dir):
+        return []
+    code, out = git.git_cmd('grep -rlF --include=".*.o.cmd" %s "%s"' % (
+        ' '.join('-e "%s"' % h for h in headers), out_dir))
+    result = []
+    for path in out.splitlines() if code == 0 else []:
+        (d, name) = os.path.split(os.path.relpath(path, out_dir))
+        if d.split('/')[0] in ['scripts', 'tools']:
+            continue
+        result.append(os.path.join(d, name[1:-len('.cmd')]))
+    return sorted(result)
+
+
+def targets(files, conf, out_dir=None):
+    """
+    the make targets of the touched files: the objects of .c files, and for
+    headers the configured targets, or else the objects including them in
+    the last build, or else vmlinux
+    """
+    result = [f[:-2] + '.o' for f in files if f.endswith('.c')]
+    headers = [f for f in files if f.endswith('.h')]
+    if headers:
+        extra = conf['headers'] or dependents(headers, out_dir) or \
+            ['vmlinux']
+        result += [t for t in extra if t not in result]
+    return result
+
+
+def make(conf, cmd, root=None, out_dir=None, jobs=None):
+    helper = GitHelper(root) if root else git
+    return helper.git_cmd('make O="%s" -j%d %s 2>&1' % (
+        out_dir or conf['dir'], jobs or conf['jobs'], cmd))
+
+
+def prepare(conf):
+    """
+    create the .config of the build dir if it has none
+    :return: the path of .config, or (target, error output)
+    """
+    out_dir = os.path.join(git.git_path, conf['dir'])
+    config_file = os.path.join(out_dir, '.config')
+    if not os.path.exists(config_file):
+        os.makedirs(out_dir, exist_ok=True)
+        code, msg = make(conf, conf['config'])
+        if code != 0:
+            return conf['config'], msg
+    return config_file
+
+
+def errors_of(target, output):
+    """
+    the error lines of make output belonging to a target
+    """
+    if target.endswith('.o'):
+        source = target[:-2] + '.c'
+        return [line for line in output.splitlines()
+                if source in line or
+                re.search(r'\b%s\]? Error' % re.escape(target), line)]
+    return [line for line in output.splitlines()
+            if re.search(r'(error|Error \d)', line)]
+
+
+def test(files, root=None, out_dir=None, jobs=None, use_cache=True):
+    """
+    build the objects affected by the touched files, in the build dir and
+    with make -k, so one broken file does not hide the others. Results are
+    cached by the kernel config, the target and the content of the files.
+    :param root: the kernel tree, git.git_path by default
+    :param out_dir: the build dir, the configured one by default
+    :param use_cache: False when the key does not tell the whole tree, such
+                      as for the steps of a series
+    :return: list of (target, error output), empty when everything builds
+    """
+    conf = settings()
+    config_file = os.path.join(out_dir, '.config') if out_dir \
+        else prepare(conf)
+    if isinstance(config_file, tuple):
+        return [config_file]
+
+    root = root or git.git_path
+    hashes = [cache.hash_file(config_file)]
+    hashes += [cache.hash_file(os.path.join(root, f)) for f in files]
+
+    failed = []
+    todo = {}
+    for t in targets(files, conf, os.path.dirname(config_file)):
+        key = cache.make_key(t, *hashes)
+        res = cache.get('build', key) if use_cache else None
+        if res is None:
+            todo[t] = key
+        elif res:
+            failed.append((t, res))
+
+    if not todo:
+        return failed
+
+    code, msg = make(conf, '-k ' + ' '.join(todo), root, out_dir, jobs)
+    results = {t: '\n'.join(errors_of(t, msg)) if code != 0 else ''
+               for t in todo}
+    if code != 0 and not any(results.values()):
+        # not caused by the targets, such as a broken build dir
+        return failed + [(' '.join(todo), msg)]
+
+    for (t, key) in todo.items():
+        use_cache and cache.put('build', key, results[t])
+        results[t] and failed.append((t, results[t]))
+    return failed
+
+
+def series_worker(index, steps, config_file, jobs):
+    """
+    build the steps of a series one after another in a worktree of its
+    own, so that make only rebuilds what changed between two steps
+    """
+    src = os.path.join(wconfig_dir, 'worktrees', 'w%d' % index)
+    out_dir = src + '-build'
+    helper = GitHelper(src)
+    results = []
+    for (i, sha, files, key) in steps:
+        if not os.path.exists(src):
+            os.makedirs(os.path.dirname(src), exist_ok=True)
+            code, msg = git.git_cmd('git worktree add -f --detach "%s" %s' %
+                                    (src, sha))
+        else:
+            code, msg = helper.git_cmd('git checkout -q -f --detach %s' % sha)
+        if code != 0:
+            results.append((i, key, [['worktree', msg]]))
+            continue
+
+        os.makedirs(out_dir, exist_ok=True)
+        if cache.hash_file(config_file) != \
+                cache.hash_file(os.path.join(out_dir, '.config')):
+            shutil.copyfile(config_file, os.path.join(out_dir, '.config'))
+        # the tree of the step is the key of its result, see test_series
+        failed = test(files, src, out_dir, jobs, use_cache=False)
+        results.append((i, key, [list(f) for f in failed]))
+    return results
+
+
+def test_series(shas):
+    """
+    build every prefix of a series: for each patch, the objects it touches
+    on top of the patches before it. The prefixes are spread over worktrees
+    built in parallel, and the result of each prefix is cached by the
+    kernel config and its tree.
+    :param shas: the commits of the series, in order
+    :return: (index, failed) of the first patch that breaks the build, or
+             None
+    """
+    conf = settings()
+    config_file = prepare(conf)
+    if isinstance(config_file, tuple):
+        return 0, [config_file]
+    config_hash = cache.hash_file(config_file)
+
+    results = [None] * len(shas)
+    todo = []
+    for i in range(len(shas)):
+        tree = git.git_cmd_str('git rev-parse %s^{tree}' % shas[i])
+        files = (git.git_cmd_str('git diff-tree --no-commit-id --name-only '
+                                 '-r %s' % shas[i]) or '').splitlines()
+        key = cache.make_key(config_hash, tree or shas[i],
+                             *targets(files, conf))
+        results[i] = cache.get('series', key)
+        results[i] is None and todo.append((i, shas[i], files, key))
+
+    if todo:
+        workers = min(len(todo), os.cpu_count() or 1)
+        jobs = max(1, conf['jobs'] // workers)
+        size = (len(todo) + workers - 1) // workers
+        chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+        with ThreadPoolExecutor(len(chunks)) as pool:
+            futures = [pool.submit(series_worker, n, chunks[n], config_file,
+                                   jobs) for n in range(len(chunks))]
+            for f in futures:
+                for (i, key, failed) in f.result():
+                    results[i] = failed
+                    if not failed or failed[0][0] != 'worktree':
+                        cache.put('series', key, failed)
+
+    for i in range(len(results)):
+        if results[i]:
+            return i, results[i]
+    return None
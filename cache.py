@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+
+from config import wconfig_dir, write_atomic
+
+cache_dir = os.path.join(wconfig_dir, 'cache')
+
+# results already loaded or computed by this process, which lives long
+# when autopatch runs as a daemon
+memory = {}
+
+
+def make_key(*parts):
+    """
+    hash the parts, such as file contents or config, into a cache key
+    """
+    h = hashlib.sha1()
+    for p in parts:
+        if isinstance(p, str):
+            p = p.encode('utf-8', 'replace')
+        h.update(p)
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def hash_file(path):
+    h = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(1 << 20), b''):
+                h.update(data)
+    except OSError:
+        return ''
+    return h.hexdigest()
+
+
+def cache_file(ns, key):
+    return os.path.join(cache_dir, ns, key[:2], key)
+
+
+def get(ns, key):
+    """
+    :return: the value stored in the namespace ns, or None
+    """
+    if (ns, key) in memory:
+        return memory[(ns, key)]
+    try:
+        with open(cache_file(ns, key), 'r') as f:
+            val = json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    memory[(ns, key)] = val
+    return val
+
+
+def put(ns, key, val):
+    memory[(ns, key)] = val
+    path = cache_file(ns, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, json.dumps(val))
+    return val
@@ -0,0 +1,211 @@
+import argparse
+
+shells = ['bash', 'zsh']
+
+# the completion of the values of options, by their metavar
+value_kinds = {
+    'key': 'keys',
+    'group': 'groups',
+    'file': 'files',
+    'dir': 'dirs',
+    'patch': 'files',
+    'path': 'files',
+    'source': 'files',
+}
+
+bash_script = r'''# bash completion of autopatch, generated by 'autopatch completion bash'
+_autopatch_values() {
+    local f=.autopatch/completion/$1
+    [ -f "$f" ] && awk -F'\t' -v p="$2" 'index($1, p) == 1 {print $1}' "$f"
+}
+
+_autopatch() {
+    local cur=${COMP_WORDS[COMP_CWORD]} prev=${COMP_WORDS[COMP_CWORD-1]}
+    local cmd= i
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        case ${COMP_WORDS[i]} in
+            %(global_values)s) ((i++));;
+            -*) ;;
+            *) cmd=${COMP_WORDS[i]}; break;;
+        esac
+    done
+
+    local kind=
+    case "$cmd $prev" in
+%(value_cases)s
+    esac
+    case $kind in
+        keys|groups) COMPREPLY=($(_autopatch_values $kind "$cur")); return;;
+        files) COMPREPLY=($(compgen -f -- "$cur")); return;;
+        dirs) COMPREPLY=($(compgen -d -- "$cur")); return;;
+        none) return;;
+        ?*) COMPREPLY=($(compgen -W "$kind" -- "$cur")); return;;
+    esac
+
+    case $cmd in
+%(option_cases)s
+    esac
+}
+complete -o filenames -F _autopatch autopatch autopatch.py
+'''
+
+zsh_script = r'''#compdef autopatch autopatch.py
+# zsh completion of autopatch, generated by 'autopatch completion zsh'
+
+_autopatch_keys() {
+    local f=.autopatch/completion/keys
+    [[ -f $f ]] || return 1
+    local -a keys
+    keys=(${(f)"$(awk -F'\t' -v p="$PREFIX" 'index($1, p) == 1 {
+        gsub(/:/, "\\:", $2); print $1 ":" $2}' $f)"})
+    _describe -V -t keys key keys
+}
+
+_autopatch_groups() {
+    local f=.autopatch/completion/groups
+    [[ -f $f ]] || return 1
+    local -a groups
+    groups=(${(f)"$(<$f)"})
+    _describe -t groups group groups
+}
+
+_autopatch() {
+    local curcontext=$curcontext state line
+    typeset -A opt_args
+    _arguments -C \
+%(global_specs)s        '1:command:->command' \
+        '*::arg:->args'
+    case $state in
+        command)
+            local -a commands
+            commands=(
+%(commands)s
+            )
+            _describe -t commands command commands
+            ;;
+        args)
+            case $line[1] in
+%(command_cases)s
+            esac
+            ;;
+    esac
+}
+
+_autopatch "$@"
+'''
+
+
+def commands_of(parser):
+    """
+    :return: list of (name, help, sub parser)
+    """
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            helps = {i.dest: i.help for i in action._choices_actions}
+            return [(name, helps.get(name) or '', sub)
+                    for (name, sub) in action.choices.items()]
+    return []
+
+
+def options_of(parser):
+    """
+    :return: list of (option strings, help, kind of value), the kind is
+             None for flags, and the positional arguments have no option
+             strings
+    """
+    result = []
+    for action in parser._actions:
+        if isinstance(action, (argparse._HelpAction,
+                               argparse._SubParsersAction)):
+            continue
+        if action.nargs == 0:
+            kind = None
+        elif action.choices:
+            kind = ' '.join(str(i) for i in action.choices)
+        else:
+            kind = value_kinds.get(action.metavar or action.dest, 'none')
+        result.append((action.option_strings, action.help or '', kind))
+    return result
+
+
+def bash(parser):
+    global_values = [o for (opts, h, kind) in options_of(parser) if kind
+                     for o in opts]
+    value_cases = ['        %s) kind=\'%s\';;' % (
+        '|'.join('" %s"' % o for o in opts), kind)
+        for (opts, h, kind) in options_of(parser) if opts and kind]
+    option_cases = ["        '') COMPREPLY=($(compgen -W '%s' -- \"$cur\"));;"
+                    % ' '.join([name for (name, h, sub) in
+                                commands_of(parser)] +
+                               [o for (opts, h, kind) in options_of(parser)
+                                for o in opts])]
+    for (name, h, sub) in commands_of(parser):
+        words = []
+        files = False
+        for (opts, h, kind) in options_of(sub):
+            words += opts
+            if opts and kind:
+                value_cases.append('        %s) kind=\'%s\';;' % (
+                    '|'.join('"%s %s"' % (name, o) for o in opts), kind))
+            files = files or (not opts and kind in ['files', 'dirs'])
+        compgen = "compgen -W '%s' -- \"$cur\"" % ' '.join(words)
+        if files:
+            compgen = '%s; compgen -f -- "$cur"' % compgen
+        option_cases.append('        %s) COMPREPLY=($(%s));;' % (name,
+                                                                  compgen))
+    return bash_script % {
+        'global_values': '|'.join(global_values) or '--',
+        'value_cases': '\n'.join(value_cases),
+        'option_cases': '\n'.join(option_cases),
+    }
+
+
+def zsh_quote(s):
+    s = ' '.join(s.split()).replace('[', '\\[').replace(']', '\\]')
+    return s.replace(':', '\\:').replace("'", "'\\''")
+
+
+def zsh_action(kind):
+    if kind in ['keys', 'groups']:
+        return '_autopatch_' + kind
+    if kind == 'files':
+        return '_files'
+    if kind == 'dirs':
+        return '_files -/'
+    if kind == 'none':
+        return ' '
+    return '(%s)' % kind
+
+
+def zsh_specs(parser, indent):
+    specs = []
+    for (opts, h, kind) in options_of(parser):
+        value = '' if kind is None else ':%s:%s' % (
+            kind if kind in value_kinds.values() else 'value',
+            zsh_action(kind))
+        if not opts:
+            if kind:
+                specs.append("'*%s'" % value)
+            continue
+        for o in opts:
+            specs.append("'%s[%s]%s'" % (o, zsh_quote(h), value))
+    return ''.join('%s%s \\\n' % (indent, i) for i in specs)
+
+
+def zsh(parser):
+    cases = []
+    for (name, h, sub) in commands_of(parser):
+        specs = zsh_specs(sub, ' ' * 24).rstrip(' \\\n')
+        cases.append('                %s)\n                    _arguments \\\n'
+                     '%s\n                    ;;' % (name, specs or
+                                                      ' ' * 24 + "'*: :'"))
+    return zsh_script % {
+        'global_specs': zsh_specs(parser, ' ' * 8),
+        'commands': '\n'.join("                '%s:%s'" % (
+            name, zsh_quote(h)) for (name, h, sub) in commands_of(parser)),
+        'command_cases': '\n'.join(cases),
+    }
+
+
+def script(parser, shell):
+    return bash(parser) if shell == 'bash' else zsh(parser)
@@ -1,12 +1,11 @@
 import datetime
+import fcntl
 import json
 import os
-import subprocess
 import uuid
 
-from dialog import Dialog
-
 from langs import _, set_lang, get_lang
+from ui import UI
 
 config_dir = os.path.join(os.environ['HOME'], '.autopatch')
 config_file = os.path.join(config_dir, 'autopatch.conf')
@@ -18,9 +17,45 @@ template_dir = os.path.join(current_dir, 'template')
 work_dir = os.getcwd()
 wconfig_dir = os.path.join(work_dir, '.autopatch')
 wconfig_file = os.path.join(wconfig_dir, 'default.conf')
+wconfig_lock = wconfig_file + '.lock'
 wconfig = {}
+# the workspace config as this process last read or wrote it, used to
+# merge the changes of other autopatch processes
+wconfig_base = {'text': None, 'stat': None}
+# keys and groups read by the shell completion, see completion.py
+completion_dir = os.path.join(wconfig_dir, 'completion')
+completion_text = {}
+
+headless_mode = False
+ui_env = 'AUTOPATCH_UI'
+
+d = UI()
+
+
+def set_headless(enable):
+    global headless_mode
+    headless_mode = enable
+
 
-d = Dialog(autowidgetsize=True)
+def write_atomic(path, s):
+    """
+    write to a temporary file and rename it, so that readers never see a
+    partly written file
+    """
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'w') as f:
+        f.write(s)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def file_stat(path):
+    try:
+        st = os.stat(path) if isinstance(path, str) else os.fstat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
 
 
 def update_uconfig():
@@ -28,9 +63,7 @@ def update_uconfig():
     docstring
     """
     s = json.dumps(uconfig)
-    with open(config_file, 'w+') as f:
-        f.write(s)
-        f.close()
+    write_atomic(config_file, s)
 
 
 class ComplexEncoder(json.JSONEncoder):
@@ -41,22 +74,113 @@ class ComplexEncoder(json.JSONEncoder):
             return json.JSONEncoder.default(self, obj)
 
 
-def update_wconfig():
+def parse_commit(commit):
+    # fromisoformat() reads '%Y-%m-%d %H:%M:%S' much faster than strptime()
+    for key in ['create', 'update']:
+        if isinstance(commit.get(key), str):
+            commit[key] = datetime.datetime.fromisoformat(commit[key])
+    return commit
+
+
+def merge_wconfig(disk, base, local):
     """
-    docstring
+    merge the workspace config written by other processes into wconfig.
+    Commits are merged by key: the ones changed or deleted by this process
+    win, the others are taken from the disk. The dicts of wconfig are
+    updated in place, so the references held by the caller stay valid.
+    :param disk: the config on the disk
+    :param base: the config when this process last read or wrote it
+    :param local: wconfig in json form
     """
-    s = json.dumps(wconfig, cls=ComplexEncoder)
-    with open(wconfig_file, 'w+') as f:
-        f.write(s)
-        f.close()
+    for key in set(disk) | set(local):
+        if key == 'commits' or local.get(key) != base.get(key):
+            continue
+        if key in disk:
+            wconfig[key] = disk[key]
+        else:
+            wconfig.pop(key, None)
+
+    base_commits = {c['key']: c for c in base.get('commits', [])}
+    local_commits = {c['key']: c for c in local.get('commits', [])}
+    objs = {}
+    for c in wconfig.get('commits', []):
+        objs.setdefault(c['key'], []).append(c)
+    commits = []
+    for c in disk.get('commits', []):
+        key = c['key']
+        if key not in local_commits:
+            # deleted by this process, or new from another one
+            key not in base_commits and commits.append(parse_commit(c))
+            continue
+        if not objs.get(key):
+            commits.append(parse_commit(c))
+            continue
+        obj = objs[key].pop(0)
+        if local_commits[key] == base_commits.get(key):
+            obj.clear()
+            obj.update(parse_commit(c))
+        commits.append(obj)
+
+    for (key, items) in objs.items():
+        # new in this process, or deleted by another one
+        if key not in base_commits or \
+                local_commits[key] != base_commits[key]:
+            commits += items
+    wconfig.setdefault('commits', [])[:] = commits
 
 
-def setup_kernel():
-    code, msg = d.editbox_str(wconfig.get('kernel') or '',
-                              title=_('work.select_kernel'))
-    clear_screen()
+def update_wconfig():
+    """
+    write the workspace config. The write is done under a lock and merged
+    with the changes of the other autopatch processes on the workspace.
+    """
+    with open(wconfig_lock, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        stat = file_stat(wconfig_file)
+        if wconfig_base['text'] is not None and stat and \
+                stat != wconfig_base['stat']:
+            with open(wconfig_file) as f:
+                disk = json.loads(f.read())
+            local = json.loads(json.dumps(wconfig, cls=ComplexEncoder))
+            merge_wconfig(disk, json.loads(wconfig_base['text']), local)
+
+        s = json.dumps(wconfig, cls=ComplexEncoder)
+        write_atomic(wconfig_file, s)
+        wconfig_base['text'] = s
+        wconfig_base['stat'] = file_stat(wconfig_file)
+        update_completion()
+
+
+def update_completion():
+    """
+    write the keys, newest first and with their titles, and the groups for
+    the shell completion, so that it does not have to start autopatch
+    """
+    commits = wconfig.get('commits') or []
+    files = {
+        'keys': ''.join('%s\t%s\n' % (c['key'], ' '.join(
+            (c.get('title') or '').split()))
+                        for c in reversed(commits)),
+        'groups': ''.join('%s\n' % i for i in sorted(set(
+            str(c['group']) for c in commits if c['group']))),
+    }
+    for (name, text) in files.items():
+        if completion_text.get(name) == text:
+            continue
+        os.makedirs(completion_dir, exist_ok=True)
+        write_atomic(os.path.join(completion_dir, name), text)
+        completion_text[name] = text
+
+
+def setup_kernel(path=None):
+    """
+    ask for the kernel of the workspace, unless path is given
+    """
+    code, msg = (d.OK, path) if path else d.editbox_str(
+        wconfig.get('kernel') or '', title=_('work.select_kernel'))
+    path or clear_screen()
 
-    if code != Dialog.OK:
+    if code != d.OK:
         print('已取消！')
         exit(0)
 
@@ -70,21 +194,43 @@ def setup_kernel():
     update_wconfig()
 
 
-def init_workspace():
+def setup_ui(name=None):
+    """
+    select the user interface: dialog or ansi, which prompts inside the
+    process. The --ui option comes first, then AUTOPATCH_UI and the 'ui' of
+    the user config.
+    """
+    name = name or os.environ.get(ui_env) or uconfig.get('ui')
+    name and d.select(name)
+
+
+def load_wconfig():
+    with open(wconfig_file) as f:
+        wconfig_base['stat'] = file_stat(f.fileno())
+        wconfig_base['text'] = f.read()
+        wconfig.update(json.loads(wconfig_base['text']))
+        f.close()
+
+
+def init_workspace(kernel=None):
     if os.path.exists(wconfig_file):
-        with open(wconfig_file) as f:
-            wconfig.update(json.loads(f.read()))
-            f.close()
-            return False
+        load_wconfig()
+        # workspaces of older versions
+        os.path.exists(completion_dir) or update_completion()
+        return False
+
+    if headless_mode and not kernel:
+        print(_('work.headless_no_workspace'))
+        exit(1)
 
-    if d.yesno(_('work.init')) != Dialog.OK:
+    if not kernel and d.yesno(_('work.init')) != d.OK:
         clear_screen()
         exit(0)
 
     if not os.path.exists(wconfig_dir):
         os.mkdir(wconfig_dir)
 
-    setup_kernel()
+    setup_kernel(kernel)
     return True
 
 
@@ -102,22 +248,38 @@ def setup_lang():
     set_lang(tags)
 
 
+def load_user():
+    """
+    load the config of the user, without asking anything
+    :return: False when the user has none yet
+    """
+    if not os.path.exists(config_file):
+        return False
+    with open(config_file) as f:
+        uconfig.update(json.loads(f.read()))
+        f.close()
+        set_lang(uconfig['lang'])
+    return True
+
+
 def init_user():
     """
     Init config for user that first use.
     """
 
-    if os.path.exists(config_file):
-        with open(config_file) as f:
-            uconfig.update(json.loads(f.read()))
-            f.close()
-            set_lang(uconfig['lang'])
-            return False
+    if load_user():
+        return False
 
-    print(_('init.user.intro'))
     if not os.path.exists(config_dir):
         os.mkdir(config_dir)
 
+    if headless_mode:
+        uconfig['lang'] = 'en'
+        update_uconfig()
+        set_lang('en')
+        return True
+
+    print(_('init.user.intro'))
     setup_lang()
     return True
 
@@ -130,12 +292,14 @@ def patch_path(patch=None):
 
 
 def clear_screen():
-    p = subprocess.Popen(['clear'], shell=False, stdout=None,
-                         stderr=None, close_fds=True)
-    p.wait()
+    if headless_mode:
+        return
+    d.clear()
 
 
 def dialog_wait():
+    if headless_mode:
+        return
     d.infobox(_('commit.wait'))
 
 
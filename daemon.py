@@ -0,0 +1,208 @@
+import io
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+
+from config import current_dir, work_dir, wconfig, wconfig_dir, \
+    wconfig_file, wconfig_base, uconfig, file_stat, load_wconfig, \
+    parse_commit
+from git import git
+
+sock_path = os.path.join(wconfig_dir, 'daemon.sock')
+daemon_env = 'AUTOPATCH_DAEMON'
+
+# seconds before an idle daemon exits
+idle_timeout = 600
+start_timeout = 5
+
+
+def version():
+    """
+    the daemon only serves clients of the same autopatch code
+    """
+    stats = [file_stat(os.path.join(current_dir, i))
+             for i in sorted(os.listdir(current_dir)) if i.endswith('.py')]
+    return str(stats)
+
+
+def enabled(args):
+    return getattr(args, 'daemon', False) or \
+        os.environ.get(daemon_env) == '1' or bool(uconfig.get('daemon'))
+
+
+def served(args):
+    """
+    tell whether the command only reads the workspace, so the daemon can
+    run it
+    """
+    action = args.action[0]
+    if action == 'stats':
+        return True
+    if action != 'log':
+        return False
+    return not any(v for (k, v) in args.__dict__.items()
+                   if k.startswith('do_'))
+
+
+def connect():
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(sock_path)
+    except OSError:
+        conn.close()
+        return None
+    return conn
+
+
+def start():
+    """
+    start the daemon of the workspace in the background
+    :return: a connection to it, or None
+    """
+    if os.path.exists(sock_path):
+        # left by a daemon that was killed
+        os.unlink(sock_path)
+    subprocess.Popen([sys.executable, os.path.join(current_dir, 'autopatch.py'),
+                      'daemon'], cwd=work_dir, stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+    deadline = time.time() + start_timeout
+    while time.time() < deadline:
+        conn = connect()
+        if conn:
+            return conn
+        time.sleep(0.02)
+    return None
+
+
+def call(request, start_daemon=True):
+    """
+    send a request to the daemon of the workspace, which is started when
+    it is not running
+    :return: the response, or None when the daemon can not serve it
+    """
+    if not os.path.exists(wconfig_file):
+        return None
+    conn = connect() or (start_daemon and start())
+    if not conn:
+        return None
+
+    request['version'] = version()
+    with conn:
+        conn.sendall(json.dumps(request).encode() + b'\n')
+        conn.shutdown(socket.SHUT_WR)
+        data = b''.join(iter(lambda: conn.recv(1 << 16), b''))
+    try:
+        resp = json.loads(data.decode())
+    except ValueError:
+        return None
+    return resp if resp.get('ok') else None
+
+
+def run(argv):
+    """
+    run a command in the daemon
+    :return: (exit code, output) or None
+    """
+    resp = call({'cmd': 'run', 'argv': argv})
+    if resp is None:
+        return None
+    return resp['code'], resp['out']
+
+
+def maintainers(args, patches):
+    """
+    get_maintainer.pl output of the patches, from the daemon if it is
+    enabled
+    """
+    if enabled(args):
+        resp = call({'cmd': 'maintainers', 'patches': patches})
+        if resp is not None:
+            return resp['out']
+    return git.get_maintainers(patches)
+
+
+def stop():
+    return call({'cmd': 'stop'}, start_daemon=False) is not None
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode())
+            resp = self.server.serve_request(request)
+        except Exception as e:
+            resp = {'ok': False, 'error': str(e)}
+        self.wfile.write(json.dumps(resp).encode())
+
+
+class Daemon(socketserver.UnixStreamServer):
+    """
+    Keep the workspace, git and the caches in memory and run the commands
+    of autopatch clients, one at a time. The workspace is reloaded when
+    another process changed it, and the daemon exits after being idle for
+    idle_timeout seconds.
+    """
+
+    def __init__(self, run_argv):
+        self.run_argv = run_argv
+        self.version = version()
+        self.idle = uconfig.get('daemon_idle', idle_timeout)
+        self.last = time.time()
+        self.running = True
+        self.timeout = min(self.idle, 5)
+        if connect():
+            print('daemon is running')
+            exit(1)
+        if os.path.exists(sock_path):
+            os.unlink(sock_path)
+        socketserver.UnixStreamServer.__init__(self, sock_path, Handler)
+
+    def serve(self):
+        try:
+            while self.running and time.time() - self.last < self.idle:
+                self.handle_request()
+        finally:
+            self.server_close()
+            os.path.exists(sock_path) and os.unlink(sock_path)
+
+    @staticmethod
+    def refresh():
+        if file_stat(wconfig_file) == wconfig_base['stat']:
+            return
+        wconfig.clear()
+        load_wconfig()
+        [parse_commit(c) for c in wconfig.get('commits', [])]
+
+    def serve_request(self, request):
+        self.last = time.time()
+        if request.get('version') != self.version:
+            # autopatch was updated, let the client run it
+            self.running = False
+            return {'ok': False}
+
+        cmd = request['cmd']
+        if cmd == 'stop':
+            self.running = False
+            return {'ok': True}
+
+        self.refresh()
+        if cmd == 'maintainers':
+            return {'ok': True,
+                    'out': git.get_maintainers(request['patches'])}
+
+        out = io.StringIO()
+        code = 0
+        with redirect_stdout(out):
+            try:
+                self.run_argv(request['argv'])
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else int(
+                    e.code is not None)
+        return {'ok': True, 'code': code, 'out': out.getvalue()}
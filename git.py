@@ -1,14 +1,34 @@
 import re
 import os
+import platform
 import subprocess
 from tempfile import NamedTemporaryFile
 
-from config import wconfig
+import cache
+from config import wconfig, file_stat
 from langs import _
+from tracer import tracer, TracedPopen
 
 remote_host = 'https://git.kernel.org'
 remote_linux_next = remote_host + '/pub/scm/linux/kernel/git/next/linux-next.git'
 remote_net_next = remote_host + '/pub/scm/linux/kernel/git/netdev/net-next.git'
+remotes = {
+    'linux-next': remote_linux_next,
+    'net-next': remote_net_next,
+}
+# checked out in a sparse kernel besides the chosen directories: what
+# checkpatch.pl and get_maintainer.pl read, and at least one directory of
+# each top level one checkpatch.pl looks for. The files at the top, such as
+# MAINTAINERS, are always there.
+sparse_base = ['scripts', 'include', 'init', 'ipc', 'kernel', 'lib',
+               'Documentation/dev-tools', 'drivers/base', 'fs/ramfs']
+# incremental commit-graph with changed-path Bloom filters, which path
+# limited git log uses to skip most tree diffs, and a multi-pack-index
+optimize_cmd = 'git commit-graph write --reachable --changed-paths --split && ' \
+    'git multi-pack-index write && git multi-pack-index expire'
+arch_dirs = {'x86_64': 'x86', 'i686': 'x86', 'aarch64': 'arm64',
+             'armv7l': 'arm', 'riscv64': 'riscv', 'ppc64le': 'powerpc',
+             'ppc64': 'powerpc', 's390x': 's390', 'loongarch64': 'loongarch'}
 
 
 class GitHelper:
@@ -19,21 +39,26 @@ class GitHelper:
         """
         self.git_path = path
 
-    def popen(self, cmd):
+    def popen(self, cmd, **kwargs):
         """
         docstring
         """
-        return subprocess.Popen('cd %s && %s' % (self.git_path, cmd), shell=True)
+        return TracedPopen(cmd, 'cd %s && %s' % (self.git_path, cmd),
+                           shell=True, **kwargs)
 
     def git_cmd(self, cmd):
-        return subprocess.getstatusoutput('cd %s && %s' % (self.git_path, cmd))
+        with tracer.command(cmd) as rec:
+            (code, res) = subprocess.getstatusoutput(
+                'cd %s && %s' % (self.git_path, cmd))
+            if rec is not None:
+                rec['code'] = code
+        return code, res
 
     def git_cmd_str(self, cmd):
         """
         docstring
         """
-        (code, res) = subprocess.getstatusoutput(
-            'cd %s && %s' % (self.git_path, cmd))
+        (code, res) = self.git_cmd(cmd)
         if code == 0:
             return res
         
@@ -68,6 +93,11 @@ class GitHelper:
         """
         return self.get_email()
 
+    def send_email_cmd(self, patches, to, cc=None, extra=''):
+        return 'git send-email --from %s --to %s %s%s %s' % (
+            self.get_from(), to, ('--cc %s' % cc) if cc else '', extra,
+            ' '.join(patches))
+
     def custom_am(self, patch, no_content=False):
 
         patch = os.path.abspath(patch)
@@ -75,26 +105,169 @@ class GitHelper:
         if not log:
             return False
 
+        if not no_content:
+            paths = self.patch_paths(patch)
+            code, msg = self.git_cmd('git apply "%s"' % patch)
+            if code != 0 or paths is None or not self.stage(paths):
+                return False
+
         tmp = NamedTemporaryFile('w+t')
         tmp.write(log)
         tmp.flush()
-        cmd = 'git commit --allow-empty -F "%s"' % tmp.name
-        if not no_content:
-            cmd = 'git apply "%s" && git add ./ && ' % patch + cmd
-        code, msg = self.git_cmd(cmd)
+        code, msg = self.git_cmd('git commit --allow-empty -F "%s"' % tmp.name)
         tmp.close()
         if code != 0:
             return False
         return True
 
+    def patch_paths(self, patch):
+        """
+        the paths a patch touches, from git apply --numstat, and the
+        sources of renames, which it does not give
+        """
+        code, out = self.git_cmd('git apply --numstat -z "%s"' % patch)
+        if code != 0:
+            return None
+        # 'added<TAB>deleted<TAB>path' items
+        paths = [i.split('\t', 2)[-1] for i in out.split('\0') if i]
+        with open(patch, 'r', errors='replace') as f:
+            for src in re.findall(r'^rename from (.+)$', f.read(), re.M):
+                if src.startswith('"'):
+                    src = src[1:-1].encode('latin-1', 'replace').decode(
+                        'unicode_escape').encode('latin-1').decode('utf-8')
+                paths.append(src)
+        return paths
+
+    def status(self):
+        """
+        the changes of the working tree, as git status --short shows them
+        :return: list of (status, path), renames give both paths
+        """
+        code, out = self.git_cmd('git status --porcelain -z')
+        if code != 0:
+            return []
+        items = out.split('\0')
+        changes = []
+        i = 0
+        while i < len(items):
+            if len(items[i]) > 3:
+                changes.append((items[i][:2], [items[i][3:]]))
+                if 'R' in items[i][:2] or 'C' in items[i][:2]:
+                    i += 1
+                    changes[-1][1].append(items[i])
+            i += 1
+        return changes
+
+    def stage(self, paths):
+        """
+        stage the given paths, including deletions, instead of the whole tree
+        :return: True on success
+        """
+        if not paths:
+            return True
+        with NamedTemporaryFile('w+t') as tmp:
+            tmp.write('\0'.join(paths))
+            tmp.flush()
+            code, msg = self.git_cmd(
+                'git --literal-pathspecs add -A --pathspec-from-file="%s" '
+                '--pathspec-file-nul' % tmp.name)
+        if code != 0:
+            print('ERROR: ' + msg)
+        return code == 0
+
+    def stage_changes(self):
+        """
+        stage what changed in the working tree, as git add ./ would, but
+        only giving git the changed paths. Changes already staged, such as
+        a git rm, are left as they are.
+        """
+        return self.stage([paths[0] for (status, paths) in self.status()
+                           if status[1] != ' '])
+
+    def staged_paths(self):
+        code, out = self.git_cmd('git diff --cached --name-only -z')
+        return [i for i in out.split('\0') if i] if code == 0 else []
+
+    def setup_fast_status(self):
+        """
+        probe and enable the untracked cache and the builtin fsmonitor of the
+        kernel, so that git status costs as much as the change, not the tree.
+        A fsmonitor set by the user, such as watchman, is left alone.
+        :return: dict of what is enabled
+        """
+        res = {'untracked_cache': False, 'fsmonitor': False}
+        print(_('git.probe_status'))
+        code, msg = self.git_cmd('git update-index --test-untracked-cache')
+        if code == 0:
+            code, msg = self.git_cmd('git config core.untrackedCache true && '
+                                     'git update-index --untracked-cache')
+            res['untracked_cache'] = code == 0
+
+        code, msg = self.git_cmd('git config core.fsmonitor')
+        if code == 0:
+            res['fsmonitor'] = msg
+            return res
+        code, msg = self.git_cmd('git fsmonitor--daemon start')
+        if code == 0 or 'already running' in msg:
+            code, msg = self.git_cmd('git config core.fsmonitor true')
+            res['fsmonitor'] = code == 0
+        return res
+
+    def collect_patches(self, path, tmp_dir):
+        """
+        list the patch files to import from a directory (ordered by its quilt
+        'series' file if any), an mbox or a single patch. Mboxes are split
+        into tmp_dir, and cover letters are skipped.
+        :return: list of patch files in apply order
+        """
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            series = os.path.join(path, 'series')
+            if os.path.exists(series):
+                with open(series, 'r') as f:
+                    names = [i.split()[0] for i in f.read().splitlines()
+                             if i.strip() and not i.startswith('#')]
+            else:
+                names = sorted(i for i in os.listdir(path)
+                               if i.endswith(('.patch', '.diff', '.eml')))
+            patches = [os.path.join(path, i) for i in names]
+        else:
+            with open(path, 'r', errors='replace') as f:
+                mails = len(re.findall(r'^From \S+ ', f.read(), re.M))
+            if mails < 2:
+                return [path]
+            code, msg = self.git_cmd('git mailsplit -o"%s" "%s"' % (tmp_dir, path))
+            if code != 0:
+                print('ERROR: ' + msg)
+                return []
+            patches = [os.path.join(tmp_dir, i)
+                       for i in sorted(os.listdir(tmp_dir))]
+
+        return [p for p in patches if not self.is_cover(p)]
+
+    @staticmethod
+    def is_cover(patch):
+        if os.path.basename(patch).endswith('cover-letter.patch'):
+            return True
+        with open(patch, 'r', errors='replace') as f:
+            head = f.read(4096)
+        return re.search(r'^Subject: .*\[[^]]*\b0+/\d+\]', head, re.M) is not None
+
     def current_signed(self):
         code, msg = self.git_cmd('git log -1 | grep "Signed-off-by:"')
         return code == 0
 
-    def find_by_title(self, title, auth=None):
+    def find_by_title(self, title, auth=None, paths=None):
+        """
+        :param paths: the files the commit touched, which lets git skip the
+                      other commits with the Bloom filters of the
+                      commit-graph
+        """
         cmd = 'git log -1 --grep="%s"' % title
         if auth:
             cmd += ' --author="%s"' % auth
+        if paths:
+            cmd += ' -- ' + ' '.join('"%s"' % i for i in paths)
         return self.git_cmd_str(cmd)
 
     def get_sig(self):
@@ -114,7 +287,41 @@ class GitHelper:
         """
         docstring
         """
-        self.git_cmd('git checkout ./ && git pull')
+        before = self.rev('@{upstream}')
+        code, msg = self.git_cmd('git checkout ./ && git pull')
+        code == 0 and self.optimize_later('@{upstream}', before)
+
+    def optimize(self):
+        """
+        write the commit-graph and the multi-pack-index of the kernel
+        :return: (code, output)
+        """
+        return self.git_cmd(optimize_cmd)
+
+    def rev(self, ref):
+        code, sha = self.git_cmd('git rev-parse -q --verify "%s"' % ref)
+        return sha if code == 0 else None
+
+    def optimize_later(self, ref, before):
+        """
+        optimize in the background when a fetch moved ref. Only the new
+        commits and packs are written, so it is cheap.
+        """
+        if self.rev(ref) == before:
+            return
+        subprocess.Popen('cd %s && %s' % (self.git_path, optimize_cmd),
+                         shell=True, stdin=subprocess.DEVNULL,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+
+    def is_ancestor(self, rev, head='HEAD'):
+        """
+        answered with the generation numbers of the commit-graph when there
+        is one, instead of walking the history
+        """
+        code, msg = self.git_cmd('git merge-base --is-ancestor %s %s' % (
+            rev, head))
+        return code == 0
 
     def get_branch(self):
         branches = self.git_cmd_str('git branch')
@@ -142,6 +349,7 @@ class GitHelper:
             print(_('git.invalid_remote'))
             return False
 
+        before = self.rev(upstream)
         code, msg = \
             self.git_cmd('git checkout ./ && git clean -df && git checkout -b %s && '
                          'git branch -D %s && git checkout %s -b %s && '
@@ -151,11 +359,85 @@ class GitHelper:
         if code != 0:
             print('ERROR: ' + msg)
             return False
+        self.optimize_later(upstream, before)
         return True
 
     def get_last_msg(self):
         return self.git_cmd_str('git log --format=%B -1')
 
+    @staticmethod
+    def diff_of(data):
+        """
+        the diff of a patch, or of git diff, without the index lines and the
+        signature, so that both give the same text for the same change
+        """
+        start = data.find('diff --git ')
+        if start < 0:
+            return ''
+        lines = data[start:].splitlines(True)
+        if '-- \n' in lines:
+            lines = lines[:lines.index('-- \n')]
+        return ''.join(i for i in lines if not i.startswith('index '))
+
+    def read_diff(self, patch):
+        with open(os.path.join(self.git_path, patch), 'r',
+                  errors='replace') as f:
+            return self.diff_of(f.read())
+
+    def script_key(self, script):
+        return str(file_stat(os.path.join(self.git_path, script)))
+
+    def get_maintainers(self, patches, diffs=None):
+        """
+        run get_maintainer.pl on the patches. The output is cached by the
+        diffs of the patches and MAINTAINERS, so 'autopatch watch' can
+        compute it before the patches exist.
+        :param diffs: the diffs of the patches, read from them by default
+        """
+        if diffs is None:
+            diffs = [self.read_diff(p) for p in patches]
+        key = cache.make_key(self.script_key('MAINTAINERS'), *diffs)
+        mt_str = cache.get('maintainers', key)
+        if mt_str is not None:
+            return mt_str
+
+        mt_str = self.git_cmd_str('./scripts/get_maintainer.pl %s' %
+                                  ' '.join(patches))
+        return mt_str and cache.put('maintainers', key, mt_str)
+
+    def checkpatch(self, patch):
+        """
+        run checkpatch.pl on a patch file, cached by the content of the patch
+        :return: (code, output)
+        """
+        with open(os.path.join(self.git_path, patch), 'r',
+                  errors='replace') as f:
+            data = f.read()
+        key = cache.make_key(self.script_key('scripts/checkpatch.pl'), data)
+        res = cache.get('checkpatch', key)
+        if res is None:
+            res = cache.put('checkpatch', key, list(self.git_cmd(
+                './scripts/checkpatch.pl %s' % patch)))
+        return tuple(res)
+
+    def checkpatch_diff(self, diff):
+        """
+        run checkpatch.pl on the diff of a change which is not committed
+        yet, without the checks of the commit message. It is an early
+        warning only, the patch is checked in full when it is stored.
+        """
+        key = cache.make_key(self.script_key('scripts/checkpatch.pl'),
+                             'diff', diff)
+        res = cache.get('checkpatch', key)
+        if res is not None:
+            return tuple(res)
+        with NamedTemporaryFile('w+t', suffix='.patch') as tmp:
+            tmp.write(diff)
+            tmp.flush()
+            res = self.git_cmd('./scripts/checkpatch.pl --no-signoff '
+                               '--ignore COMMIT_MESSAGE %s' % tmp.name)
+        return tuple(cache.put('checkpatch', key, list(res)))
+
     @staticmethod
     def mt_parse(mt_str: str):
         """
@@ -192,3 +474,50 @@ def init_git():
     if not git.get_last_title():
         print(_('args.not_git'))
         exit(1)
+
+
+def sparse_dirs(dirs):
+    machine = platform.machine()
+    result = sparse_base + ['arch/' + arch_dirs.get(machine, machine)]
+    return result + [i.strip('/') for i in dirs if i.strip('/') not in result]
+
+
+def clone_kernel(path, remote='linux-next', sparse=None, full=False):
+    """
+    clone the kernel as a blobless partial clone: the history is there,
+    but the content of files is only downloaded when it is checked out or
+    read. The other remotes of autopatch are added the same way.
+    :param sparse: only check out these directories, see sparse_base
+    :param full: download everything, as a plain git clone
+    :return: the path of the kernel, None on failure
+    """
+    path = os.path.abspath(path)
+    url = remotes.get(remote, remote)
+    name = remote if remote in remotes else 'origin'
+    cmd = 'git clone --no-checkout --origin %s%s "%s" "%s"' % (
+        name, '' if full else ' --filter=blob:none', url, path)
+    p = GitHelper(os.path.dirname(path)).popen(cmd)
+    p.communicate()
+    if p.returncode != 0:
+        return None
+
+    kernel = GitHelper(path)
+    cmds = []
+    for (n, u) in remotes.items():
+        if n == name or u == url:
+            continue
+        cmds.append('git remote add %s %s' % (n, u))
+        if not full:
+            cmds.append('git config remote.%s.promisor true' % n)
+            cmds.append('git config remote.%s.partialclonefilter blob:none'
+                        % n)
+    if sparse:
+        cmds.append('git sparse-checkout set --cone %s' %
+                    ' '.join('"%s"' % i for i in sparse_dirs(sparse)))
+    cmds.append('git checkout "$(git symbolic-ref --short HEAD)"')
+    for cmd in cmds:
+        code, msg = kernel.git_cmd(cmd)
+        if code != 0:
+            print('ERROR: ' + msg)
+            return None
+    return path
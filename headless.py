@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+
+from langs import _
+
+defaults = {
+    # template used by 'commit', see 'template/'
+    'template': '01-default',
+    # commit message, either the text itself or a file containing it
+    'message': '',
+    # meta info of the patch, the keys are the ones of machine.meta_info
+    'tags': {},
+    # 'stop' or 'ignore' when checkpatch reports errors
+    'checkpatch': 'stop',
+    # 'stop' or 'ignore' when the commit message has lint errors
+    'lint': 'stop',
+    # 'stop' or 'ignore' when the compile test fails
+    'build': 'stop',
+    # 'kernel', 'test' or 'loopback'
+    'target': 'test',
+    'test_email': '',
+    # 'maintainers', 'first' or a list of emails
+    'to': 'maintainers',
+    # 'rest', 'none' or a list of emails
+    'cc': 'rest',
+    # cover letter of a series, either the text itself or a file
+    'cover': '',
+    # create the group if it does not exist yet
+    'new_group': True,
+}
+
+
+class Answers(dict):
+    """
+    Answers to the prompts of CommitMachine, used instead of dialog when
+    autopatch runs headless.
+    """
+
+    def text(self, key):
+        val = self.get(key) or ''
+        if val and '\n' not in val and os.path.isfile(val):
+            with open(val, 'r') as f:
+                return f.read()
+        return val
+
+    @staticmethod
+    def emails(val):
+        if isinstance(val, str):
+            return [i.strip() for i in val.split(',') if i.strip()]
+        return list(val)
+
+    def pick_to(self, mts):
+        policy = self['to']
+        if policy == 'first':
+            return [mts[0]['email']]
+        if policy == 'maintainers':
+            to = [mt['email'] for mt in mts
+                  if mt.get('des', '').startswith('maintainer')]
+            return to or [mts[0]['email']]
+        return self.emails(policy)
+
+    def pick_cc(self, mts, to):
+        policy = self['cc']
+        if policy == 'none':
+            return []
+        if policy == 'rest':
+            return [mt['email'] for mt in mts if mt['email'] not in to]
+        return self.emails(policy)
+
+
+def detect():
+    """
+    tell whether autopatch runs headless before the arguments are fully
+    parsed, as the user config is loaded before that
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--headless', action='store_true')
+    parser.add_argument('--answers')
+    known, unknown = parser.parse_known_args()
+    return known.headless or bool(known.answers)
+
+
+def load(args):
+    """
+    build the answers from --answers and the answer flags, or return None
+    when autopatch is not headless
+    """
+    if not getattr(args, 'headless', False) and \
+            not getattr(args, 'answers', None):
+        return None
+
+    answers = Answers(defaults)
+    answers['tags'] = {}
+    if args.answers:
+        with open(args.answers, 'r') as f:
+            answers.update(json.loads(f.read()))
+
+    for key in ['template', 'message', 'target', 'to', 'cc', 'cover']:
+        val = getattr(args, 'answer_' + key, None)
+        if val is not None:
+            answers[key] = val
+    if getattr(args, 'answer_tag', None) is not None:
+        answers['tags']['tag'] = args.answer_tag
+    if getattr(args, 'ignore_checkpatch', False):
+        answers['checkpatch'] = 'ignore'
+    if getattr(args, 'ignore_lint', False):
+        answers['lint'] = 'ignore'
+    if getattr(args, 'ignore_build', False):
+        answers['build'] = 'ignore'
+    return answers
+
+
+def add_args(parser):
+    """
+    add the arguments that make a sub command headless
+    """
+    parser.add_argument('--headless', dest='headless',
+                        action='store_true', required=False,
+                        help=_('args.headless'))
+    parser.add_argument('--answers', dest='answers', metavar='file',
+                        required=False,
+                        help=_('args.answers'))
+    parser.add_argument('--template', dest='answer_template',
+                        metavar='name', required=False,
+                        help=_('args.answer.template'))
+    parser.add_argument('--message', dest='answer_message',
+                        metavar='file', required=False,
+                        help=_('args.answer.message'))
+    parser.add_argument('--tag', dest='answer_tag', metavar='tag',
+                        required=False, help=_('args.answer.tag'))
+    parser.add_argument('--target', dest='answer_target',
+                        choices=['kernel', 'test', 'loopback'],
+                        required=False,
+                        help=_('args.answer.target'))
+    parser.add_argument('--to', dest='answer_to', metavar='to',
+                        required=False,
+                        help=_('args.answer.to'))
+    parser.add_argument('--cc', dest='answer_cc', metavar='cc',
+                        required=False,
+                        help=_('args.answer.cc'))
+    parser.add_argument('--cover', dest='answer_cover', metavar='file',
+                        required=False, help=_('args.answer.cover'))
+    parser.add_argument('--ignore-checkpatch', dest='ignore_checkpatch',
+                        action='store_true', required=False,
+                        help=_('args.answer.ignore-checkpatch'))
+    parser.add_argument('--ignore-lint', dest='ignore_lint',
+                        action='store_true', required=False,
+                        help=_('args.answer.ignore-lint'))
+    parser.add_argument('--ignore-build', dest='ignore_build',
+                        action='store_true', required=False,
+                        help=_('args.answer.ignore-build'))
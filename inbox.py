@@ -0,0 +1,296 @@
+import email
+import email.policy
+from email.header import decode_header, make_header
+import json
+import os
+import re
+import subprocess
+
+from config import wconfig_dir, write_atomic
+
+state_file = os.path.join(wconfig_dir, 'inbox.json')
+
+# trailers of replies, by the keys of machine.meta_info
+trailers = {
+    'Reviewed-by': 'by-review',
+    'Acked-by': 'by-ack',
+    'Tested-by': 'by-test',
+    'Reported-by': 'by-report',
+}
+trailer_re = re.compile(r'^(%s):\s*(.+?)\s*$' % '|'.join(trailers), re.M)
+msgid_re = re.compile(r'<[^<>\s]+>')
+# save the watermarks every so many messages, so that an interrupted
+# refresh does not start again from the beginning
+save_every = 10000
+
+
+def load_state():
+    if not os.path.exists(state_file):
+        return {'sources': {}, 'threads': {}}
+    with open(state_file, 'r') as f:
+        return json.loads(f.read())
+
+
+def save_state(state):
+    write_atomic(state_file, json.dumps(state))
+
+
+def normalize_subject(subject):
+    """
+    the title of a patch from the subject of a mail, without 'Re:' and
+    the [PATCH ...] prefixes
+    """
+    subject = ' '.join(subject.split())
+    while True:
+        m = re.match(r'^(?:(?:re|fwd?|aw)\s*:\s*|\[[^]]*\]\s*)', subject,
+                     re.I)
+        if not m:
+            return subject
+        subject = subject[m.end():]
+
+
+def is_cover(subject):
+    return re.search(r'\[[^]]*\b0+/\d+\]', subject) is not None
+
+
+def git_messages(repo, watermark):
+    """
+    the raw messages added to a public-inbox git repo (v1, or an epoch of
+    v2) after the watermark commit, streamed with one git log and one
+    git cat-file --batch
+    :return: iterator of (commit, message bytes)
+    """
+    git_dir = '--git-dir=%s' % repo
+    rev = 'HEAD'
+    if watermark:
+        code = subprocess.call(['git', git_dir, 'cat-file', '-e',
+                                watermark + '^{commit}'],
+                               stderr=subprocess.DEVNULL)
+        rev = '%s..HEAD' % watermark if code == 0 else rev
+
+    log = subprocess.Popen(['git', git_dir, 'log', '--reverse', '--raw',
+                            '--no-abbrev', '--diff-filter=AM',
+                            '--format=%x00%H', rev],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    cat = subprocess.Popen(['git', git_dir, 'cat-file', '--batch'],
+                           stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        commit = None
+        for line in log.stdout:
+            if line.startswith(b'\0'):
+                commit = line[1:].strip().decode()
+                continue
+            if not line.startswith(b':'):
+                continue
+            blob = line.split()[3]
+            cat.stdin.write(blob + b'\n')
+            cat.stdin.flush()
+            header = cat.stdout.readline().split()
+            if len(header) < 3 or header[1] != b'blob':
+                continue
+            data = cat.stdout.read(int(header[2]) + 1)[:-1]
+            yield commit, data
+    finally:
+        cat.stdin.close()
+        cat.wait()
+        log.stdout.close()
+        log.wait()
+
+
+def public_inbox_repos(path):
+    """
+    the git repos of a public-inbox mirror: the epochs of v2 in order,
+    or the repo itself for v1
+    """
+    epochs = os.path.join(path, 'git')
+    if os.path.isdir(epochs):
+        names = [i for i in os.listdir(epochs) if re.match(r'^\d+\.git$', i)]
+        return [os.path.join(epochs, i)
+                for i in sorted(names, key=lambda x: int(x.split('.')[0]))]
+    return [path]
+
+
+def maildir_messages(path, watermark):
+    """
+    the messages of a Maildir delivered after the watermark, which is the
+    newest mtime seen and the names of the files with that mtime
+    """
+    mark = watermark or {'mtime': 0, 'names': []}
+    files = []
+    for sub in ['new', 'cur']:
+        d = os.path.join(path, sub)
+        if not os.path.isdir(d):
+            continue
+        with os.scandir(d) as it:
+            for e in it:
+                mtime = e.stat().st_mtime_ns
+                if mtime > mark['mtime'] or \
+                        (mtime == mark['mtime'] and e.name not in
+                         mark['names']):
+                    files.append((mtime, e.name, e.path))
+    files.sort()
+    for (mtime, name, path) in files:
+        if mtime != mark['mtime']:
+            mark = {'mtime': mtime, 'names': []}
+        mark['names'].append(name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        yield dict(mark, names=list(mark['names'])), data
+
+
+def mbox_messages(path, watermark):
+    """
+    the messages appended to an mbox after the watermark offset
+    :return: iterator of (offset after the message, message bytes)
+    """
+    offset = watermark or 0
+    if os.path.getsize(path) < offset:
+        # the mbox was rewritten
+        offset = 0
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        lines = []
+        while True:
+            line = f.readline()
+            if not line or (line.startswith(b'From ') and lines):
+                if lines:
+                    yield f.tell() - len(line), b''.join(lines[1:])
+                if not line:
+                    return
+                lines = []
+            lines.append(line)
+
+
+def messages(source, watermark):
+    """
+    the new messages of a source: a public-inbox mirror, a Maildir or an
+    mbox
+    :return: iterator of (watermark after the message, message bytes)
+    """
+    if os.path.isdir(os.path.join(source, 'cur')):
+        yield from maildir_messages(source, watermark)
+        return
+    if os.path.isfile(source):
+        yield from mbox_messages(source, watermark)
+        return
+
+    marks = dict(watermark or {})
+    for repo in public_inbox_repos(source):
+        for (commit, data) in git_messages(repo, marks.get(repo)):
+            marks[repo] = commit
+            yield dict(marks), data
+
+
+def body_of(msg):
+    parts = msg.walk() if msg.is_multipart() else [msg]
+    text = []
+    for part in parts:
+        if part.get_content_type() != 'text/plain':
+            continue
+        payload = part.get_payload(decode=True) or b''
+        text.append(payload.decode(part.get_content_charset() or 'utf-8',
+                                   'replace'))
+    return '\n'.join(text)
+
+
+class Tracker:
+    """
+    Link the mails of the sources to the patches of the workspace, and
+    collect the trailers given in the replies. Only the Message-IDs of the
+    threads of our patches are kept, so memory does not grow with the size
+    of the mirror.
+    """
+
+    def __init__(self, commits):
+        self.state = load_state()
+        self.threads = self.state['threads']
+        self.commits = {c['key']: c for c in commits}
+        self.titles = {}
+        self.covers = {}
+        for c in sorted(commits, key=lambda x: x['update']):
+            self.titles[c['title']] = c['key']
+            if c.get('cover') and c['group']:
+                subject = c['cover'].strip().splitlines()[0]
+                self.covers[normalize_subject(subject)] = c['group']
+        self.groups = {}
+        for c in commits:
+            c['group'] and self.groups.setdefault(c['group'], []).append(
+                c['key'])
+        self.count = 0
+        self.replies = 0
+        self.added = {}
+
+    def keys_of(self, target):
+        if target.startswith('group:'):
+            return self.groups.get(target[6:], [])
+        return [target] if target in self.commits else []
+
+    def target_of(self, msg, subject):
+        """
+        the patch (key) or the series ('group:' + name) a mail belongs to
+        """
+        refs = msgid_re.findall('%s %s' % (msg.get('In-Reply-To', ''),
+                                           msg.get('References', '')))
+        for ref in reversed(refs):
+            if ref in self.threads:
+                return self.threads[ref]
+        title = normalize_subject(subject)
+        if is_cover(subject) and title in self.covers:
+            return 'group:' + self.covers[title]
+        return self.titles.get(title)
+
+    def add(self, data):
+        self.count += 1
+        msg = email.message_from_bytes(data, policy=email.policy.compat32)
+        try:
+            subject = str(make_header(decode_header(msg.get('Subject', ''))))
+        except (ValueError, LookupError):
+            subject = str(msg.get('Subject', ''))
+        target = self.target_of(msg, subject)
+        if not target:
+            return
+
+        msgid = msgid_re.findall(msg.get('Message-ID', ''))
+        msgid and self.threads.setdefault(msgid[0], target)
+        if not re.match(r'^\s*re\s*:', subject, re.I):
+            return
+
+        self.replies += 1
+        body = '\n'.join(i for i in body_of(msg).splitlines()
+                         if not i.startswith('>'))
+        for (name, value) in trailer_re.findall(body):
+            for key in self.keys_of(target):
+                self.add_trailer(self.commits[key], trailers[name], value)
+
+    def add_trailer(self, commit, meta_key, value):
+        meta = commit.setdefault('meta', {'tag': commit.get('tag', '')})
+        values = [i.strip() for i in (meta.get(meta_key) or '').split(';')
+                  if i.strip()]
+        if value in values:
+            return
+        meta[meta_key] = '; '.join(values + [value])
+        self.added.setdefault(commit['key'], []).append(
+            '%s: %s' % ([k for (k, v) in trailers.items()
+                         if v == meta_key][0], value))
+
+    def refresh(self, source, store):
+        """
+        read the mails of the source which are newer than its watermark
+        :param store: saves the commits, called before the watermark is
+                      saved
+        """
+        source = os.path.abspath(source)
+        marks = self.state['sources']
+        n = 0
+        for (mark, data) in messages(source, marks.get(source)):
+            self.add(data)
+            marks[source] = mark
+            n += 1
+            if n % save_every == 0:
+                store()
+                save_state(self.state)
+        store()
+        save_state(self.state)
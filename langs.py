@@ -17,9 +17,23 @@ langs = {
         'args.no-content': '指定该参数时，restore和clone都将丢弃具体的提交内容',
         'args.group': '指定要提交到的分组，同一个分组的提交会作为一个系列补丁，使用send -g <group>来进行发送',
         'args.send-group': '将指定分组的补丁作为系列补丁进行发送',
-        'args.import-patch': '根据现有patch文件，导入到工作空间',
+        'args.import-patch': '根据现有patch文件，导入到工作空间。也可以是包含系列补丁的目录或mbox文件，'
+                             '这些补丁会通过一次git am导入，并作为一个分组（默认以目录或文件名命名）',
+        'args.import-edit': '导入系列补丁时，逐个确认和编辑补丁（git am -i）',
 
         'args.log.group': '查找特定分组的记录',
+        'args.log.status': '只显示这些状态的记录，以逗号分隔，如re_commit,finish',
+        'args.log.since': '只显示在该日期（含）之后创建的记录，格式为YYYY-MM-DD[ HH:MM[:SS]]',
+        'args.log.until': '只显示在该日期之前创建的记录，格式同--since',
+        'args.log.version': '只显示该版本的记录',
+        'args.log.title': '只显示标题匹配该正则表达式（不区分大小写）的记录',
+        'args.log.search': '搜索补丁内容：提交信息、增删的代码行和修改的文件路径中包含所有这些词的记录，'
+                           '以*结尾的词按前缀匹配，目录（如net/core/）匹配其下的所有文件',
+        'args.log.sort': '按该字段排序',
+        'args.log.desc': '与--sort配合，按降序排序',
+        'args.log.limit': '最多显示的记录数',
+        'args.log.offset': '跳过前面的记录数，与--limit配合进行分页',
+        'args.log.format': '输出格式：table（默认）、json、csv或ndjson（每行一个JSON对象）',
         'args.log.import': '将autopatch-export.json中的数据导入到当前仓库',
         'args.log.export': '将指定的提交数据导出到文件autopatch-export.json',
         'args.clear': '删除所有的log记录',
@@ -32,6 +46,98 @@ langs = {
         'args.open': '将提交的状态改为re_commit',
 
         'args.send': '进行补丁的发送',
+        'args.headless': '无界面运行，使用--answers文件或以下参数中的答案代替所有的交互',
+        'args.answers': 'JSON格式的答案文件，指定后即为无界面运行',
+        'args.answer.template': '无界面运行时使用的模板，默认01-default',
+        'args.answer.message': '无界面运行时使用的提交日志文件',
+        'args.answer.tag': '无界面运行时补丁的Tag，如net-next',
+        'args.answer.target': '无界面运行时补丁的发送目的地：kernel、test或loopback，默认test',
+        'args.answer.to': '无界面运行时的收件人：maintainers、first或以逗号分隔的邮箱',
+        'args.answer.cc': '无界面运行时的抄送人：rest、none或以逗号分隔的邮箱',
+        'args.answer.cover': '无界面运行时系列补丁的封面文件',
+        'args.answer.ignore-checkpatch': '无界面运行时忽略checkpatch的错误',
+        'commit.headless_no_message': '无界面运行时需要通过--message或答案文件提供提交日志！',
+        'commit.headless_no_cover': '无界面运行时需要通过--cover或答案文件提供系列补丁的封面！',
+        'commit.headless_no_test_email': '无界面运行时需要在答案文件中提供test_email！',
+        'work.headless_no_workspace': '当前目录不是AutoPatch工作空间，无界面运行前请先执行autopatch init',
+        'args.ui': '交互界面：dialog，或在进程内直接提示的ansi（响应更快，适合SSH），也可通过环境变量AUTOPATCH_UI或用户配置中的ui指定',
+        'args.spell': '使用内核的scripts/spelling.txt（以及工作空间中的.autopatch/spelling.txt）并行扫描拼写错误，并按MAINTAINERS中的子系统分组',
+        'args.spell.paths': '只扫描这些路径，默认扫描整个内核仓库',
+        'args.spell.jobs': '并行的进程数，默认为CPU数',
+        'args.spell.commit': '为每个子系统修复拼写错误，并使用拼写错误模板创建提交',
+        'spell.no_words': '找不到拼写错误列表scripts/spelling.txt！',
+        'spell.summary': '共发现{hits}处拼写错误，涉及{groups}个子系统',
+        'spell.dirty': '内核仓库存在未提交的修改，请先进行处理！',
+        'args.daemon': '通过工作空间的后台进程执行只读的命令（如log、stats）并获取维护者，后台进程会按需启动，'
+                       '空闲一段时间后退出，也可通过环境变量AUTOPATCH_DAEMON=1或用户配置中的daemon启用',
+        'args.daemon-cmd': '在前台运行工作空间的后台进程，一般由autopatch --daemon自动启动',
+        'args.daemon.stop': '停止工作空间的后台进程',
+        'args.build': '设置编译测试：提交保存后只编译补丁涉及的文件，不带参数时显示当前设置；指定文件时立即编译测试这些文件',
+        'args.build.files': '要编译测试的文件（相对于内核仓库）',
+        'args.build.dir': '编译输出目录（make O=），相对于内核仓库，设置后启用编译测试',
+        'args.build.jobs': '编译的并行数（make -j），默认为CPU数',
+        'args.build.headers': '修改头文件时编译的目标，以逗号分隔，如net/ipv4/',
+        'args.build.config': '编译目录中没有.config时用来生成它的make目标，默认为defconfig',
+        'args.build.disable': '关闭编译测试',
+        'args.no-build': '本次提交跳过编译测试',
+        'args.answer.ignore-build': '无界面运行时忽略编译测试的错误',
+        'args.answer.ignore-lint': '无界面运行时忽略提交信息检查的错误',
+        'build.disabled': '编译测试未启用，请先使用autopatch build --dir <dir>设置编译目录！',
+        'commit.lint_err': '提交信息存在问题，请进行修复，修复完成后运行autopatch.py commit -c来进行提交。',
+        'commit.build_err': '补丁编译失败，请进行修复，修复完成后运行autopatch.py commit -c来进行提交。',
+        'commit.build_ok': '补丁涉及的文件编译通过！',
+        'commit.series_err': '系列补丁的第{order}/{count}个补丁（{title}）应用后编译失败，请修复后再发送：',
+        'commit.series_ok': '系列补丁的每一步都编译通过！',
+        'args.check': '检查所有未完成的补丁和分组能否应用到最新的上游代码：clean（直接应用）、needs-3way（需要三方合并）'
+                      '或conflicts（存在冲突），使用临时的索引，不修改工作区',
+        'args.check.ref': '上游的引用，默认为当前分支的上游分支，如origin/master',
+        'args.check.fetch': '检查前先从上游引用所在的远程仓库拉取',
+        'args.check.verbose': '显示git apply的输出',
+        'args.check.overlap': '不应用补丁，列出修改了相同代码行的未完成补丁和分组',
+        'upstream.overlap_set': '第{index}组：{count}个系列修改了相同的代码行',
+        'upstream.overlap_summary': '共{count}组重叠',
+        'commit.overlap_warn': '警告：以下未完成的系列修改了相同的代码行，其中一个合入后另一个将无法应用：',
+        'upstream.invalid_ref': '无效的上游引用：{ref}',
+        'args.rebase': '把所有未完成的补丁和分组变基到最新的上游代码并重新生成补丁文件，使用临时的索引，不修改工作区和分支，'
+                       '只有存在冲突的补丁需要手动处理',
+        'args.rebase.ref': '变基到的上游引用，默认为当前分支的上游分支，如origin/master',
+        'upstream.conflict': '{key}（{title}）存在冲突，请使用autopatch log -r {key}恢复到内核仓库后手动解决',
+        'upstream.summary': '{count}个补丁已对照{ref}检查：',
+        'upstream.rebased': '{count}个补丁已变基到{ref}：',
+        'args.inbox': '从邮件列表的本地镜像（public-inbox仓库、Maildir或mbox）读取新邮件，把回复关联到已发送的补丁，'
+                      '并把回复中的Reviewed-by、Acked-by、Tested-by和Reported-by加入补丁的标签',
+        'args.inbox.sources': '邮件来源，会记录到工作空间，之后不指定时使用记录的来源',
+        'args.inbox.reset': '忘记已读取的位置，重新读取所有邮件',
+        'inbox.no_source': '没有邮件来源，请指定public-inbox仓库、Maildir或mbox的路径！',
+        'inbox.summary': '读取了{count}封新邮件，其中{replies}封是对补丁的回复，{patches}个补丁有新的标签',
+        'args.init.clone': '把内核以blobless部分克隆的方式下载到该目录，并作为工作区的内核',
+        'args.init.remote': '克隆的远程仓库，{remotes}之一或一个URL，默认为linux-next',
+        'args.init.sparse': '只检出这些目录（以逗号分隔），以及checkpatch和get_maintainer需要的目录',
+        'args.init.full': '完整克隆，下载所有文件内容',
+        'init.clone_err': '内核克隆失败！',
+        'args.completion': '输出shell补全脚本，例如在~/.bashrc中加入eval "$(autopatch completion bash)"',
+        'args.completion.shell': 'shell的类型',
+        'args.repo': '维护内核仓库',
+        'args.repo.action': 'optimize：写入带变更路径布隆过滤器的commit-graph和multi-pack-index，加快历史查询，并建立标题前缀的索引；'
+                            'prefix：更新各文件历史上使用的标题前缀的索引，并给出这些文件最可能的前缀；'
+                            'fast-status：检测并启用untracked cache和fsmonitor，使git status只与修改的多少有关',
+        'args.repo.paths': 'prefix查询的文件',
+        'repo.optimized': '内核仓库已优化',
+        'repo.prefix_updated': '已索引{count}个新的提交',
+        'git.probe_status': '正在检测内核仓库能否使用untracked cache和fsmonitor……',
+        'repo.fast_status': 'untracked cache：{untracked_cache}，fsmonitor：{fsmonitor}',
+        'args.watch': '监视内核目录的修改，在后台预先计算维护者、checkpatch和编译测试的结果，使提交时无需等待',
+        'args.watch.poll': '定时检查内核目录，而不使用inotify',
+        'args.watch.once': '只计算一次当前的修改后退出',
+        'args.watch.debounce': '最后一次修改后等待的秒数，默认为1秒',
+        'watch.poll': 'inotify不可用（{err}），改为定时检查内核目录',
+        'watch.ready': '已预先计算{files}个文件的检查，用时{seconds:.1f}秒：checkpatch {checkpatch}，编译 {build}',
+        'args.send.no-build': '发送系列补丁前不检查每个补丁应用后能否编译',
+        'args.stats': '统计补丁的提交频率、版本数、从发送到被采纳的时间等数据',
+        'args.stats.weeks': '显示最近多少周的数据，默认12',
+        'args.stats.prometheus': '同时将统计数据以Prometheus textfile格式写入到指定文件',
+        'args.trace': '记录各个状态及外部命令的耗时，结果保存在.autopatch/trace/中（也可设置环境变量AUTOPATCH_TRACE=1）',
+        'args.profile': '在--trace的基础上使用cProfile进行更详细的性能分析（或AUTOPATCH_TRACE=profile）',
 
         'git.invalid_branch': '当前未处于有效分支！',
         'work.init': '当前目录非AutoPatch工作空间，是否将其初始化为工作空间？',
@@ -44,6 +150,9 @@ langs = {
         'commit.send_target': '请选择补丁发送的目的地',
         'commit.to_kernel': '发送到开源社区',
         'commit.to_test': '发送到测试邮箱',
+        'commit.to_loopback': '发送到本地Maildir，用git am应用后与保存的补丁比较',
+        'commit.loopback_err': '补丁经过邮件往返后发生了变化：',
+        'commit.loopback_ok': '{count}个补丁经过邮件往返后没有变化',
         'commit.checkpatch_err': '补丁存在格式错误，请进行修复，修复完成后运行autopatch.py --continue来进行提交。'
                                  '格式错误信息如下：',
         'commit.review': '是否要预览补丁？',
@@ -104,6 +213,19 @@ langs = {
         'args.send-group': 'Send the patch of the specified group as a series of patches',
 
         'args.log.group': 'Find records in a specific group',
+        'args.log.status': 'only show the records in these statuses, comma separated, such as re_commit,finish',
+        'args.log.since': 'only show the records created on or after the date, YYYY-MM-DD[ HH:MM[:SS]]',
+        'args.log.until': 'only show the records created before the date, in the format of --since',
+        'args.log.version': 'only show the records of the version',
+        'args.log.title': 'only show the records whose title matches the regex, ignoring case',
+        'args.log.search': 'search the patches: records whose commit message, added or removed lines and '
+                           'touched paths contain all the words; a word ending with * matches as a prefix, '
+                           'and a directory such as net/core/ matches all the files below it',
+        'args.log.sort': 'sort by the field',
+        'args.log.desc': 'sort in descending order, with --sort',
+        'args.log.limit': 'show at most this number of records',
+        'args.log.offset': 'skip this number of records, for paging with --limit',
+        'args.log.format': 'output format: table (default), json, csv or ndjson (one JSON object per line)',
         'args.log.import': 'import commit from autopatch-export.json',
         'args.log.export': 'export commit to autopatch-export.json',
         'args.clear': 'Delete all log records',
@@ -114,9 +236,128 @@ langs = {
         'args.title': 'change commit title',
         'args.no-add': 'not git add',
         'args.open': 'change a log\'s status to re_commit',
-        'args.import-patch': 'import patch into current workspace',
+        'args.import-patch': 'import patch into current workspace. It can also be a directory or an mbox with a '
+                             'series, which is applied with one git am and stored as a group (named after the '
+                             'directory or file by default)',
+        'args.import-edit': 'confirm and edit every patch when importing a series (git am -i)',
 
         'args.send': 'send the patches',
+        'args.headless': 'run without terminal, use the answers from --answers or the options below instead of '
+                         'prompts',
+        'args.answers': 'JSON file with the answers, implies --headless',
+        'args.answer.template': 'template to use when headless, 01-default by default',
+        'args.answer.message': 'file with the commit message when headless',
+        'args.answer.tag': 'tag of the patch when headless, such as net-next',
+        'args.answer.target': 'where to send when headless: kernel, test or loopback, test by default',
+        'args.answer.to': 'recipients when headless: maintainers, first or comma separated emails',
+        'args.answer.cc': 'cc when headless: rest, none or comma separated emails',
+        'args.answer.cover': 'file with the cover letter of a series when headless',
+        'args.answer.ignore-checkpatch': 'ignore checkpatch errors when headless',
+        'commit.headless_no_message': 'a commit message is required when headless, use --message or the answers file!',
+        'commit.headless_no_cover': 'a cover letter is required when headless, use --cover or the answers file!',
+        'commit.headless_no_test_email': 'test_email is required in the answers file when headless!',
+        'work.headless_no_workspace': 'The current directory is not an AutoPatch workspace, run autopatch init first',
+        'args.ui': 'user interface: dialog, or ansi which prompts inside the process (faster, suits SSH); '
+                   'AUTOPATCH_UI or "ui" in the user config can also set it',
+        'args.spell': 'scan for misspellings in parallel with the kernel\'s scripts/spelling.txt (and '
+                      '.autopatch/spelling.txt of the workspace), grouped by MAINTAINERS section',
+        'args.spell.paths': 'only scan these paths, the whole kernel by default',
+        'args.spell.jobs': 'number of processes, the number of CPUs by default',
+        'args.spell.commit': 'fix the misspellings and create a commit per section with the misspellings template',
+        'spell.no_words': 'cannot find the misspelling list scripts/spelling.txt!',
+        'spell.summary': '{hits} misspellings found in {groups} sections',
+        'spell.dirty': 'the kernel tree has uncommitted changes, please handle them first!',
+        'args.daemon': 'run read-only commands (such as log and stats) and get maintainers through the daemon of '
+                       'the workspace, which is started on demand and exits when idle; AUTOPATCH_DAEMON=1 or '
+                       '"daemon" in the user config can also enable it',
+        'args.daemon-cmd': 'run the daemon of the workspace in the foreground, autopatch --daemon starts it '
+                           'automatically',
+        'args.daemon.stop': 'stop the daemon of the workspace',
+        'args.build': 'set up the compile test, which builds only the files touched by a patch after it is stored; '
+                      'without options the settings are shown, with files they are compile tested now',
+        'args.build.files': 'files to compile test, relative to the kernel tree',
+        'args.build.dir': 'build output directory (make O=), relative to the kernel tree; setting it enables the '
+                          'compile test',
+        'args.build.jobs': 'number of make jobs, the number of CPUs by default',
+        'args.build.headers': 'comma separated targets built when a header is touched, such as net/ipv4/',
+        'args.build.config': 'make target creating .config when the build dir has none, defconfig by default',
+        'args.build.disable': 'disable the compile test',
+        'args.no-build': 'skip the compile test for this commit',
+        'args.answer.ignore-build': 'ignore compile test errors when headless',
+        'args.answer.ignore-lint': 'ignore commit message errors when headless',
+        'build.disabled': 'the compile test is disabled, set the build dir with autopatch build --dir <dir> first!',
+        'commit.lint_err': 'The commit message has problems, please fix it. After the repair is complete, run '
+                           'autopatch.py commit -c to commit.',
+        'commit.build_err': 'The patch does not build, please fix it. After the repair is complete, run '
+                            'autopatch.py commit -c to continue.',
+        'commit.build_ok': 'The files touched by the patch build!',
+        'commit.series_err': 'The build breaks at patch {order}/{count} ({title}) of the series, '
+                             'please fix it before sending:',
+        'commit.series_ok': 'Every step of the series builds!',
+        'args.check': 'check whether the open patches and groups apply to the latest upstream: clean, needs-3way '
+                      'or conflicts; temporary indexes are used, the working tree is not touched',
+        'args.check.ref': 'upstream ref, the upstream of the current branch by default, such as origin/master',
+        'args.check.fetch': 'fetch the remote of the upstream ref before checking',
+        'args.check.verbose': 'show the output of git apply',
+        'args.check.overlap': 'instead of applying anything, list the open patches and groups which change the '
+                              'same lines',
+        'upstream.overlap_set': 'set {index}: {count} series change the same lines',
+        'upstream.overlap_summary': '{count} overlap sets',
+        'commit.overlap_warn': 'warning: these other open series change the same lines, one of them will not apply '
+                               'once the other is merged:',
+        'upstream.invalid_ref': 'invalid upstream ref: {ref}',
+        'args.rebase': 'rebase the open patches and groups onto the latest upstream and regenerate their patch files; '
+                       'temporary indexes are used, the working tree and the branches are not touched, and only '
+                       'conflicting patches are left to resolve by hand',
+        'args.rebase.ref': 'upstream ref to rebase onto, the upstream of the current branch by default, such as '
+                           'origin/master',
+        'upstream.conflict': '{key} ({title}) conflicts, restore it into the kernel with autopatch log -r {key} '
+                             'and resolve it by hand',
+        'upstream.summary': '{count} patches checked against {ref}: ',
+        'upstream.rebased': '{count} patches rebased onto {ref}: ',
+        'args.inbox': 'read the new mails of local mailing list mirrors (public-inbox repos, Maildirs or mboxes), '
+                      'link the replies to the sent patches and add the Reviewed-by, Acked-by, Tested-by and '
+                      'Reported-by of the replies to the tags of the patches',
+        'args.inbox.sources': 'mail sources, remembered by the workspace and used when none is given',
+        'args.inbox.reset': 'forget the positions already read and read all the mails again',
+        'inbox.no_source': 'no mail source, give the path of a public-inbox repo, a Maildir or an mbox!',
+        'inbox.summary': '{count} new mails read, {replies} replies to patches, {patches} patches got new tags',
+        'args.init.clone': 'download the kernel into this directory as a blobless partial clone, and use it as '
+                           'the kernel of the workspace',
+        'args.init.remote': 'the remote to clone, one of {remotes} or an URL, linux-next by default',
+        'args.init.sparse': 'only check out these directories (separated by commas), plus the ones checkpatch and '
+                            'get_maintainer need',
+        'args.init.full': 'make a full clone, downloading the content of all the files',
+        'init.clone_err': 'failed to clone the kernel!',
+        'args.completion': 'print the shell completion script, for example add '
+                           'eval "$(autopatch completion bash)" to ~/.bashrc',
+        'args.completion.shell': 'the shell',
+        'args.repo': 'maintain the kernel repo',
+        'args.repo.action': 'optimize: write the commit-graph, with changed-path Bloom filters, and the '
+                            'multi-pack-index, which speed up history queries, and build the subject prefix index; '
+                            'prefix: update the index of the subject prefixes used in the history of every file, and '
+                            'suggest the likely prefixes of the files; '
+                            'fast-status: probe and enable the untracked cache and fsmonitor, so that git status costs '
+                            'as much as the change',
+        'args.repo.paths': 'the files to suggest a prefix for',
+        'repo.optimized': 'the kernel repo is optimized',
+        'repo.prefix_updated': '{count} new commits indexed',
+        'git.probe_status': 'checking whether the kernel repo can use the untracked cache and fsmonitor...',
+        'repo.fast_status': 'untracked cache: {untracked_cache}, fsmonitor: {fsmonitor}',
+        'args.watch': 'watch the kernel tree and precompute the maintainers, checkpatch and the compile test of the '
+                      'changes in the background, so that commit does not wait for them',
+        'args.watch.poll': 'look at the kernel tree periodically instead of using inotify',
+        'args.watch.once': 'precompute the current changes once and exit',
+        'args.watch.debounce': 'seconds to wait after the last change, 1 by default',
+        'watch.poll': 'inotify is not available ({err}), looking at the kernel tree periodically',
+        'watch.ready': 'checks of {files} files precomputed in {seconds:.1f}s: checkpatch {checkpatch}, build {build}',
+        'args.send.no-build': 'do not check that the series builds after each of its patches before sending',
+        'args.stats': 'show statistics such as patches per week, versions per patch and time from send to applied',
+        'args.stats.weeks': 'number of recent weeks to show, 12 by default',
+        'args.stats.prometheus': 'also write the statistics to the given file in Prometheus textfile format',
+        'args.trace': 'record the time spent in every state and external command into .autopatch/trace/ '
+                      '(or set AUTOPATCH_TRACE=1)',
+        'args.profile': 'like --trace, but also profile with cProfile (or set AUTOPATCH_TRACE=profile)',
 
         'git.invalid_branch': 'Currently not in a valid branch! ',
         'work.init': 'The current directory is not an AutoPatch workspace. Should it be initialized as a workspace? ',
@@ -130,6 +371,9 @@ langs = {
         'commit.send_target': 'Please select the destination of the patch',
         'commit.to_kernel': 'Send to open source community',
         'commit.to_test': 'Send to test mailbox',
+        'commit.to_loopback': 'Send to a local Maildir, apply with git am and compare with the stored patches',
+        'commit.loopback_err': 'the patches changed on their way through mail:',
+        'commit.loopback_ok': '{count} patches came back through mail unchanged',
         'commit.checkpatch_err': 'The patch has a format error, please fix it. After the repair is complete, '
                                  'run autopatch.py ​​--continue to submit it. '
                                  'The format error message is as follows:',
@@ -0,0 +1,138 @@
+import re
+import subprocess
+
+from git import git
+
+max_subject = 75
+max_line = 75
+min_sha = 12
+
+fixes_re = re.compile(r'^Fixes:\s*(\S*)\s*(.*)$', re.I)
+commit_ref_re = re.compile(r'\bcommit\s+([0-9a-f]{6,40})\s*\(\"(.+?)\"\)',
+                           re.I | re.S)
+trailer_re = re.compile(r'^([A-Za-z-]+-by|Fixes|Link|Closes|Cc):\s*\S', re.I)
+
+
+def read_objects(shas):
+    """
+    look up all the shas in a single git cat-file --batch session
+    :return: dict of sha -> (type, content), None for unknown ones
+    """
+    if not shas:
+        return {}
+    p = git.popen('git cat-file --batch', stdin=subprocess.PIPE,
+                  stdout=subprocess.PIPE)
+    out, _ = p.communicate(''.join('%s\n' % s for s in shas).encode())
+
+    # the output may be cut short when git fails, the shas which are not
+    # answered in full are unknown
+    objects = dict.fromkeys(shas)
+    pos = 0
+    for sha in shas:
+        end = out.find(b'\n', pos)
+        if end < 0:
+            break
+        header = out[pos:end].decode('utf-8', 'replace').split()
+        pos = end + 1
+        if len(header) != 3 or not header[2].isdigit():
+            # missing or ambiguous
+            continue
+        size = int(header[2])
+        if pos + size > len(out):
+            break
+        objects[sha] = (header[1], out[pos:pos + size].decode('utf-8',
+                                                               'replace'))
+        pos += size + 1
+    return objects
+
+
+def commit_subject(content):
+    msg = content.split('\n\n', 1)
+    return msg[1].splitlines()[0].strip() if len(msg) > 1 and msg[1] else ''
+
+
+def check_refs(refs):
+    """
+    verify the commits referenced as (line, sha, subject)
+    :return: list of errors
+    """
+    errors = []
+    objects = read_objects(sorted(set(sha for (_, sha, _) in refs)))
+    for (line, sha, subject) in refs:
+        obj = objects.get(sha)
+        if len(sha) < min_sha:
+            errors.append('"%s": use at least %d characters of the sha' %
+                          (line, min_sha))
+        if obj is None:
+            errors.append('"%s": unknown commit %s' % (line, sha))
+        elif obj[0] != 'commit':
+            errors.append('"%s": %s is a %s, not a commit' % (line, sha,
+                                                              obj[0]))
+        elif subject != commit_subject(obj[1]):
+            errors.append('"%s": the subject of %s is ("%s")' % (
+                line, sha, commit_subject(obj[1])))
+    return errors
+
+
+def lint(msg, committer):
+    """
+    check a commit message against the common kernel rules
+    :param committer: 'name <email>' of the commit, who signs it off
+    :return: (errors, warnings)
+    """
+    errors = []
+    warnings = []
+    lines = msg.rstrip('\n').splitlines()
+    subject = lines[0] if lines else ''
+
+    if not subject.strip():
+        return ['the subject is empty'], []
+    if len(subject) > max_subject:
+        errors.append('the subject has %d characters, more than %d' %
+                      (len(subject), max_subject))
+    if not re.match(r'^[\w./,-]+(?: [\w./,-]+)*: \S', subject):
+        warnings.append('the subject has no "subsystem: " prefix')
+    if subject.rstrip().endswith('.'):
+        warnings.append('the subject ends with a period')
+    if len(lines) > 1 and lines[1].strip():
+        errors.append('no blank line after the subject')
+
+    refs = []
+    body = lines[2:]
+    if not any(i.strip() for i in body if not trailer_re.match(i)):
+        warnings.append('the commit message has no body')
+    for line in body:
+        m = fixes_re.match(line)
+        if m:
+            sub = re.match(r'^\("(.*)"\)$', m.group(2).strip())
+            if not re.match(r'^[0-9a-f]{6,40}$', m.group(1)) or not sub:
+                errors.append('"%s": use Fixes: <sha> ("subject")' % line)
+            else:
+                refs.append((line, m.group(1), sub.group(1)))
+            continue
+        if len(line) > max_line and not re.search(r'\w+://', line) and \
+                not trailer_re.match(line) and not line.startswith(' '):
+            warnings.append('line longer than %d characters: "%s"' %
+                            (max_line, line))
+    for m in commit_ref_re.finditer('\n'.join(body)):
+        refs.append(('commit %s' % m.group(1), m.group(1),
+                     ' '.join(m.group(2).split())))
+
+    trailers = [i.strip() for i in body if trailer_re.match(i)]
+    for t in set(trailers):
+        if trailers.count(t) > 1:
+            warnings.append('duplicated "%s"' % t)
+    if 'Signed-off-by: %s' % committer not in trailers:
+        errors.append('no "Signed-off-by: %s"' % committer)
+
+    errors += check_refs(refs)
+    return errors, warnings
+
+
+def lint_head():
+    """
+    lint the last commit of the kernel
+    """
+    out = git.git_cmd_str('git log -1 --format="%cn <%ce>%x00%B"') or ''
+    committer, msg = (out.split('\0', 1) + [''])[:2]
+    return lint(msg, committer)
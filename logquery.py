@@ -0,0 +1,122 @@
+import csv
+import heapq
+import itertools
+import json
+import re
+import sys
+from datetime import datetime
+
+from config import ComplexEncoder
+
+formats = ['table', 'json', 'csv', 'ndjson']
+columns = ['key', 'create', 'update', 'version', 'group', 'order', 'status',
+           'title']
+sort_keys = ['create', 'update', 'version', 'group', 'order', 'status',
+             'title', 'key']
+
+
+def parse_date(val):
+    for fmt in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']:
+        try:
+            return datetime.strptime(val, fmt)
+        except ValueError:
+            continue
+    raise ValueError('invalid date: %s' % val)
+
+
+def parse_title(val):
+    try:
+        return re.compile(val, re.I)
+    except re.error as e:
+        raise ValueError('invalid title regex: %s (%s)' % (val, e))
+
+
+def make_filter(args):
+    """
+    build the predicate of the log filters
+    """
+    checks = []
+    if getattr(args, 'key', None):
+        checks.append(lambda c: c['key'] == args.key)
+    if getattr(args, 'status', None):
+        status = set(args.status.split(','))
+        checks.append(lambda c: c.get('status') in status)
+    if getattr(args, 'version', None):
+        checks.append(lambda c: c['version'] == args.version)
+    if getattr(args, 'since', None):
+        since = parse_date(args.since)
+        checks.append(lambda c: c['create'] >= since)
+    if getattr(args, 'until', None):
+        until = parse_date(args.until)
+        checks.append(lambda c: c['create'] < until)
+    if getattr(args, 'title', None):
+        title = parse_title(args.title)
+        checks.append(lambda c: title.search(c['title']))
+    return lambda c: all(check(c) for check in checks)
+
+
+def select(commits, args):
+    """
+    filter, sort and page the commits lazily, so that the output starts
+    before all the commits are looked at. Only sorting keeps the matching
+    commits, and with --limit only offset + limit of them.
+    """
+    items = filter(make_filter(args), commits)
+    offset = args.offset or 0
+    limit = args.limit
+
+    if args.sort:
+        field = args.sort
+        reverse = args.desc
+
+        def sort_key(c):
+            # ungrouped commits have the group 0, and old commits may lack
+            # a field: they sort first, numbers by value, the rest as text
+            value = c.get(field)
+            if value is None or value == '' or (field == 'group' and
+                                                not value):
+                return 0, 0, ''
+            if isinstance(value, (int, float)):
+                return 1, value, ''
+            return 1, 0, str(value)
+
+        if limit is not None:
+            pick = heapq.nlargest if reverse else heapq.nsmallest
+            items = pick(offset + limit, items, key=sort_key)
+        else:
+            items = sorted(items, key=sort_key, reverse=reverse)
+
+    stop = None if limit is None else offset + limit
+    return itertools.islice(items, offset, stop)
+
+
+def row(commit):
+    return [commit.get(i, '') for i in columns]
+
+
+def write(commits, fmt='table', out=sys.stdout):
+    """
+    write the commits one by one in the given format
+    """
+    if fmt == 'table':
+        out.write('%-12s %-20s %-20s %-8s %-8s %-6s %-10s %-20s\n' % (
+            'key', 'create date', 'update date', 'version', 'group', 'order',
+            'status', 'title'))
+        for c in commits:
+            out.write('%-12s %-20s %-20s v%-7s %-8s %-6s %-10s %-20s\n' %
+                      tuple(row(c)))
+    elif fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for c in commits:
+            writer.writerow(['%s' % i for i in row(c)])
+    elif fmt == 'ndjson':
+        for c in commits:
+            out.write(json.dumps(c, cls=ComplexEncoder) + '\n')
+    elif fmt == 'json':
+        sep = '\n'
+        out.write('[')
+        for c in commits:
+            out.write(sep + json.dumps(c, cls=ComplexEncoder))
+            sep = ',\n'
+        out.write('\n]\n')
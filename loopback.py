@@ -0,0 +1,171 @@
+import difflib
+import email
+import email.policy
+import os
+import re
+import shlex
+from email.header import decode_header, make_header
+from tempfile import TemporaryDirectory
+
+import upstream
+from config import wconfig_dir
+from git import git, GitHelper
+
+worktree = os.path.join(wconfig_dir, 'worktrees', 'loopback')
+address = 'loopback@localhost'
+number_re = re.compile(r'\[[^]]*?\b(\d+)/\d+\]')
+
+
+def sendmail_cmd(maildir):
+    """
+    the sendmail of git send-email: it delivers the mail on stdin into the
+    Maildir, the recipients given as arguments are ignored
+    """
+    tmp = shlex.quote(os.path.join(maildir, 'tmp', 'XXXXXXXX'))
+    new = shlex.quote(os.path.join(maildir, 'new', ''))
+    return 'deliver() { f=$(mktemp %s) && cat > "$f" && mv "$f" %s; }; ' \
+           'deliver' % (tmp, new)
+
+
+def send(patches, maildir):
+    """
+    send the patches with git send-email, as a real send does, but into
+    the Maildir
+    :return: (code, output)
+    """
+    for sub in ['tmp', 'new', 'cur']:
+        os.makedirs(os.path.join(maildir, sub), exist_ok=True)
+    extra = ' --confirm=never --sendmail-cmd=%s' % shlex.quote(
+        sendmail_cmd(maildir))
+    return git.git_cmd(git.send_email_cmd(patches, address, None, extra))
+
+
+def subject_of(path):
+    with open(path, 'rb') as f:
+        msg = email.message_from_binary_file(f, policy=email.policy.compat32)
+    try:
+        return str(make_header(decode_header(msg.get('Subject', ''))))
+    except (ValueError, LookupError):
+        return str(msg.get('Subject', ''))
+
+
+def received(maildir):
+    """
+    the delivered patches in the order of the series, without the cover
+    letter
+    """
+    new = os.path.join(maildir, 'new')
+    mails = []
+    for name in os.listdir(new):
+        path = os.path.join(new, name)
+        subject = ' '.join(subject_of(path).split())
+        if re.search(r'\[[^]]*\b0+/\d+\]', subject):
+            continue
+        m = number_re.search(subject)
+        mails.append((int(m.group(1)) if m else 0,
+                      os.stat(path).st_mtime_ns, path))
+    return [path for (i, mtime, path) in sorted(mails)]
+
+
+def expected(base, patches):
+    """
+    commit the stored patches on base with a temporary index, as
+    upstream.rebase does
+    :return: list of shas, None for the patches which do not apply
+    """
+    shas = []
+    with TemporaryDirectory() as tmp:
+        index = os.path.join(tmp, 'index')
+        code, msg = git.git_cmd('GIT_INDEX_FILE="%s" git read-tree %s' %
+                                (index, base))
+        parent = base if code == 0 else None
+        for p in patches:
+            res = parent and upstream.apply_cached(index, p)[0]
+            sha = res in [upstream.CLEAN, upstream.THREE_WAY] and \
+                upstream.commit_patch(index, parent, p)
+            shas.append(sha or None)
+            parent = sha or None
+    return shas
+
+
+def apply_mails(base, mails):
+    """
+    git am the mails on base in the scratch worktree, which is kept
+    between runs so that a checkout only updates what changed
+    :return: (list of shas, error)
+    """
+    helper = GitHelper(worktree)
+    if not os.path.exists(worktree):
+        os.makedirs(os.path.dirname(worktree), exist_ok=True)
+        code, msg = git.git_cmd('git worktree add -f --detach "%s" %s' %
+                                (worktree, base))
+    else:
+        helper.git_cmd('git am --abort')
+        code, msg = helper.git_cmd('git checkout -q -f --detach %s' % base)
+    if code != 0:
+        return [], msg
+
+    code, msg = helper.git_cmd('git am -q %s' % ' '.join(
+        '"%s"' % i for i in mails))
+    shas = helper.git_cmd_str('git rev-list --reverse %s..HEAD' % base)
+    if code != 0:
+        helper.git_cmd('git am --abort')
+    return (shas or '').split(), msg if code != 0 else ''
+
+
+def show_commit(sha):
+    """
+    the author and the message of a commit, without the blank lines at the
+    end which git commit-tree keeps and git am drops
+    """
+    return (git.git_cmd_str('git log -1 --format="%%an <%%ae>%%n%%B" %s' %
+                            sha) or '').rstrip()
+
+
+def compare(patch, want, got):
+    """
+    :return: the differences of the received commit to the stored patch,
+             empty when there are none
+    """
+    name = os.path.basename(patch)
+    if not want:
+        return '%s: does not apply' % name
+    if not got:
+        return '%s: git am failed' % name
+    problems = []
+    diff = git.git_cmd_str('git diff %s %s' % (want, got))
+    diff and problems.append(diff)
+    a = show_commit(want).splitlines()
+    b = show_commit(got).splitlines()
+    if a != b:
+        problems.append('\n'.join(difflib.unified_diff(
+            a, b, 'stored', 'received', lineterm='')))
+    return '\n'.join(['%s:' % name] + problems) if problems else ''
+
+
+def run(patches):
+    """
+    send the patches to a Maildir, git am the mails in a scratch worktree
+    and compare the commits with those of the stored patches
+    :return: (number of patches checked, list of problems)
+    """
+    patches = [p for p in patches if not git.is_cover(p)]
+    base = git.rev('HEAD~%d' % len(patches))
+    if not base:
+        return 0, ['HEAD~%d: unknown revision' % len(patches)]
+    with TemporaryDirectory() as tmp:
+        maildir = os.path.join(tmp, 'Maildir')
+        code, msg = send(patches, maildir)
+        if code != 0:
+            return 0, [msg]
+        mails = received(maildir)
+        if len(mails) != len(patches):
+            return 0, ['%d patches sent, %d mails received' % (
+                len(patches), len(mails))]
+        got, err = apply_mails(base, mails)
+
+    want = expected(base, patches)
+    got += [None] * (len(patches) - len(got))
+    problems = [i for i in map(compare, patches, want, got) if i]
+    err and problems.append(err)
+    return len(patches), problems
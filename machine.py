@@ -2,27 +2,55 @@ from tempfile import NamedTemporaryFile, TemporaryDirectory
 import json
 import os
 import re
+import sqlite3
 import uuid
 from shutil import copyfile
 from config import *
 from datetime import datetime, timedelta
 from git import git
+import build
+import lint
+import loopback
+import daemon
+import search
+import overlap
+import prefixes
 from langs import _
+from tracer import tracer
 
 meta_info = {
     'tag': 'Tag',
     'by-report': 'Reported-by',
     'by-test': 'Tested-by',
-    'by-ack': 'Acked-by'
+    'by-ack': 'Acked-by',
+    'by-review': 'Reviewed-by'
 }
 
 
 class Commit:
+    # commits by group, see group_index()
+    groups = None
+    groups_id = None
 
     @staticmethod
     def get_commits():
         return wconfig.setdefault('commits', [])
 
+    @staticmethod
+    def group_index():
+        """
+        index of the commits by group. It is rebuilt when commits are added
+        or removed, or the workspace config is written.
+        """
+        commits = Commit.get_commits()
+        index_id = (id(commits), len(commits), wconfig_base['stat'])
+        if Commit.groups_id != index_id:
+            Commit.groups = {}
+            for c in commits:
+                Commit.groups.setdefault(c['group'], []).append(c)
+            Commit.groups_id = index_id
+        return Commit.groups
+
     @staticmethod
     def log_export(patches):
         for p in patches:
@@ -40,10 +68,7 @@ class Commit:
 
     @staticmethod
     def format_commit(commit):
-        commit['create'] = datetime.strptime(
-            commit['create'], '%Y-%m-%d %H:%M:%S')
-        commit['update'] = datetime.strptime(
-            commit['update'], '%Y-%m-%d %H:%M:%S')
+        parse_commit(commit)
 
     @staticmethod
     def log_import(path):
@@ -61,6 +86,8 @@ class Commit:
                 f.write(p.pop('patch_data'))
 
             Commit.get_commits().append(p)
+            search.update(p)
+            overlap.update(p)
             print('import commit:%s' % p['title'])
         Commit.store_commit()
 
@@ -93,10 +120,23 @@ class Commit:
         commits.append(commit)
         return commit
 
+    @staticmethod
+    def set_status(commit, status):
+        """
+        change the status of a commit and record the transition in its
+        event history, which is used by 'autopatch stats'
+        """
+        if commit.get('status') == status:
+            return
+        commit['status'] = status
+        commit.setdefault('events', []).append(
+            [datetime.now().strftime('%Y-%m-%d %H:%M:%S'), status,
+             commit['version']])
+
     @staticmethod
     def update_commit(commit, status=None):
         if status:
-            commit['status'] = status
+            Commit.set_status(commit, status)
         update_wconfig()
 
     @staticmethod
@@ -118,7 +158,7 @@ class Commit:
 
     @staticmethod
     def find_group(group):
-        data = [i for i in Commit.get_commits() if i['group'] == group]
+        data = list(Commit.group_index().get(group, []))
         data.sort(key=lambda x: x['order'])
         return data
 
@@ -142,6 +182,8 @@ class Commit:
         if not commit:
             return
         Commit.get_commits().remove(commit)
+        search.remove(key)
+        overlap.remove(key)
         patch = patch_path(commit['patch'])
         if os.path.exists(patch):
             os.remove(patch)
@@ -202,8 +244,10 @@ class Commit:
             return False
         subject = 'Subject: [%s]' % subject
 
-        by_info = ['%s: %s' % (meta_info[k], v)
-                   for (k, v) in meta.items() if k.startswith('by-') and v]
+        # several people may give the same tag, separated by ';'
+        by_info = ['%s: %s' % (meta_info[k], i.strip())
+                   for (k, v) in meta.items() if k.startswith('by-') and v
+                   for i in v.split(';') if i.strip()]
         by_info = by_info and '\n'.join(by_info)
 
         with open(patch, 'r') as f:
@@ -224,6 +268,25 @@ class Commit:
 
         return True
 
+    @staticmethod
+    def save_patch(commit):
+        """
+        format the last commit of the kernel into the patch of the commit
+        """
+        if not os.path.exists(patch_path()):
+            os.mkdir(patch_path())
+
+        if commit['patch'] and os.path.exists(patch_path(commit['patch'])):
+            os.remove(patch_path(commit['patch']))
+
+        patch = git.git_cmd_str('git format-patch -1 -o %s' % patch_path())
+        patch = os.path.basename(patch)
+
+        commit['patch'] = patch
+        commit['title'] = git.get_last_title()
+        search.update(commit)
+        overlap.update(commit)
+
     @staticmethod
     def cover_name(patch):
         return '%s_cover.patch' % patch[:-6]
@@ -235,6 +298,7 @@ class Commit:
         new['version'] = 1
         new['create'] = datetime.now()
         new['update'] = datetime.now()
+        new['events'] = []
 
         patch = new['patch']
         new_patch = '%s_%s.patch' % (patch[:-6], uuid.uuid4().hex)
@@ -242,13 +306,32 @@ class Commit:
         copyfile(patch_path(patch), patch_path(new_patch))
 
         Commit.get_commits().append(new)
+        search.update(new)
+        overlap.update(new)
         return new
 
     @staticmethod
     def finish_group(group):
         groups = Commit.find_group(group)
         for g in groups:
-            g['status'] = 'finish'
+            Commit.set_status(g, 'finish')
+
+    @staticmethod
+    def touched_paths(commits):
+        """
+        the files touched by the patches of the commits, or None when one of
+        them has no patch, so that git log can be limited to them
+        """
+        paths = set()
+        for c in commits:
+            patch = c.get('patch') and patch_path(c['patch'])
+            if not patch or not os.path.exists(patch):
+                return None
+            files = build.patch_files(patch)
+            if not files:
+                return None
+            paths.update(files)
+        return sorted(paths)
 
     @staticmethod
     def update_log():
@@ -262,13 +345,36 @@ class Commit:
         git.git_dist_clean()
 
         since = (datetime.now() + timedelta(days=-120)).strftime('%Y-%m-%d')
-        logs = git.git_cmd_str(
-            'git log --format=%%s --author="%s" --since="%s"' % (git.get_email(), since))
-        logs = logs.splitlines()
+        email = git.get_email()
+        # with the touched paths, the Bloom filters of the commit-graph skip
+        # most commits, as long as --author does not make git read all of
+        # them: the author is checked here instead
+        paths = Commit.touched_paths(commits)
+        if paths:
+            cmd = 'git log --format=%%ae%%x09%%s --since="%s"' % since
+        else:
+            cmd = 'git log --format=%%s --author="%s" --since="%s"' % (
+                email, since)
+        # only walk the commits added since the last update, when none of
+        # the commits is newer than it
+        tip = git.git_cmd_str('git rev-parse HEAD')
+        last = wconfig.get('log_update') or {}
+        if last.get('tip') and all(str(c['create']) < last['time']
+                                   for c in commits) and \
+                git.is_ancestor(last['tip'], tip):
+            cmd += ' %s..%s' % (last['tip'], tip)
+        if paths:
+            cmd += ' -- ' + ' '.join('"%s"' % i for i in paths)
+        logs = (git.git_cmd_str(cmd) or '').splitlines()
+        if paths:
+            logs = [i.split('\t', 1)[1] for i in logs
+                    if i.split('\t', 1)[0] == email]
+        wconfig['log_update'] = {
+            'tip': tip, 'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
         updated = [c for c in commits if c['title'] in logs]
         for c in updated:
-            c['status'] = 'applied'
+            Commit.set_status(c, 'applied')
         updated = [c['title'] for c in updated]
 
         Commit.store_commit()
@@ -277,12 +383,15 @@ class Commit:
         print('\n'.join(updated)) if updated else print('None')
 
     @staticmethod
-    def get_next_order(group):
+    def get_next_order(group, answers=None):
         order = 0
         if group:
             order = Commit.max_order(group)
             if not order:
-                if d.yesno(_('commit.new_group')) != d.OK:
+                if answers is not None:
+                    if not answers['new_group']:
+                        return n()
+                elif d.yesno(_('commit.new_group')) != d.OK:
                     return n()
             order += 1
         return order
@@ -299,6 +408,8 @@ class CommitMachine:
         self.args = args
         self.start_state = None
         self.isolate = False
+        # answers used instead of prompts when headless, see headless.py
+        self.answers = getattr(args, 'answers_data', None)
 
     def set_start(self, start):
         self.start_state = start
@@ -306,10 +417,11 @@ class CommitMachine:
     def run(self, state_args=None):
         handler = getattr(self, self.start_state or 'start')
         while handler:
-            if state_args:
-                next_state, state_args = handler(state_args)
-            else:
-                next_state, state_args = handler()
+            with tracer.span(handler.__name__):
+                if state_args:
+                    next_state, state_args = handler(state_args)
+                else:
+                    next_state, state_args = handler()
 
             if not next_state:
                 update_wconfig()
@@ -318,7 +430,7 @@ class CommitMachine:
 
     def pause(self, next_status=None):
         if self.commit and next_status:
-            self.commit['status'] = next_status
+            Commit.set_status(self.commit, next_status)
         Commit.store_commit()
         return None, next_status
 
@@ -332,6 +444,13 @@ class CommitMachine:
         return self.pause('finish')
 
     def send_test(self, patches):
+        if 'test_email' not in wconfig and self.answers is not None:
+            if not self.answers['test_email']:
+                print(_('commit.headless_no_test_email'))
+                return self.pause('re_commit')
+            wconfig['test_email'] = self.answers['test_email']
+            update_wconfig()
+
         if 'test_email' not in wconfig:
             code, msg = d.inputbox(_('commit.test_email'), title=_(
                 'commit.test_email_info'), init='')
@@ -352,10 +471,7 @@ class CommitMachine:
         """
 
         patches, to, cc = info
-        cmd = 'git send-email --from %s --to %s %s %s' % (
-            git.get_from(), to,
-            ('--cc %s' % cc) if cc else '',
-            ' '.join(patches))
+        cmd = git.send_email_cmd(patches, to, cc)
         print('%s %s' % (_('commit.send_cmd'), cmd))
         p = git.popen(cmd)
         p.communicate()
@@ -388,8 +504,8 @@ class CommitMachine:
 
         # get maintainer from patches
         dialog_wait()
-        patch_str = ' '.join(patches[1:]) if len(patches) > 1 else patches[0]
-        mt_str = git.git_cmd_str('./scripts/get_maintainer.pl %s' % patch_str)
+        mt_str = daemon.maintainers(self.args, patches[1:]
+                                    if len(patches) > 1 else patches)
         mts = git.mt_parse(mt_str)
         clear_screen()
         if not mts:
@@ -402,6 +518,18 @@ class CommitMachine:
                    for i in cc_bk + to_bk if i not in mts_set])
         mts_set = mts_set.union(set(cc_bk + to_bk))
 
+        if self.answers is not None:
+            recipients = self.answers.pick_to(mts)
+            ccs = self.answers.pick_cc(mts, recipients)
+            if not recipients:
+                print(_('commit.no_to'))
+                return self.pause('re_commit')
+            commit['to'] = recipients
+            commit['cc'] = ccs
+            Commit.store_commit()
+            return n('send_email', (patches, ','.join(recipients),
+                                    ','.join(ccs)))
+
         # select recipients, default none
         print(_('commit.select_mt'))
         while True:
@@ -450,19 +578,52 @@ class CommitMachine:
         return n('send_email', (patches, to, cc))
 
     def select_send(self, patches):
+        if self.group:
+            self.warn_overlap([c['key'] for c in Commit.find_group(self.group)])
+        elif self.commit:
+            self.warn_overlap([self.commit['key']])
+
+        targets = {'kernel': 'select_mt', 'test': 'send_test',
+                   'loopback': 'send_loopback'}
+        if self.answers is not None:
+            return n(targets.get(self.answers['target'], 'send_test'), patches)
+
         code, msg = d.menu(_('commit.send_target'),
-                           choices=[('kernel', _('commit.to_kernel')), ('test', _('commit.to_test'))])
+                           choices=[('kernel', _('commit.to_kernel')), ('test', _('commit.to_test')),
+                                    ('loopback', _('commit.to_loopback'))])
         clear_screen()
         if code != d.OK:
             return self.pause('re_commit')
 
-        return n('select_mt', patches) if msg == 'kernel' else n('send_test', patches)
+        return n(targets[msg], patches)
 
-    def re_commit(self):
-        if not self.args.no_add:
-            cmd = 'git add ./ && git commit --amend'
+    def send_loopback(self, patches):
+        """
+        send the patches into a local Maildir, git am the mails and compare
+        the result with the stored patches, to find what mail damages
+        without waiting for a server
+        """
+        dialog_wait()
+        count, problems = loopback.run(patches)
+        clear_screen()
+        if not problems:
+            msg = _('commit.loopback_ok').format(count=count)
+            print(msg) if self.answers is not None else d.msgbox(msg)
+            clear_screen()
+            return self.pause()
+
+        msg = '%s\n%s' % (_('commit.loopback_err'), '\n'.join(problems))
+        if self.answers is not None:
+            print(msg)
         else:
-            cmd = 'git commit --amend'
+            d.scrollbox(msg)
+            clear_screen()
+        return self.pause('re_commit')
+
+    def re_commit(self):
+        if not self.args.no_add and not git.stage_changes():
+            return n()
+        cmd = 'git commit --amend'
         commit = self.commit
         new_version = commit['version'] != 1
         tmp = NamedTemporaryFile('w+t') if new_version else None
@@ -477,6 +638,9 @@ class CommitMachine:
             if not git.current_signed():
                 cmd += ' -s'
 
+        if self.answers is not None:
+            cmd = cmd.replace(' --edit', '') + ' --no-edit'
+
         p = git.popen(cmd)
         p.communicate()
         tmp and tmp.close()
@@ -487,15 +651,21 @@ class CommitMachine:
         commit['title'] = git.get_last_title()
         commit['update'] = datetime.now()
 
-        return n('store')
+        return n('lint_commit')
 
     def check_patch(self, patches):
         err = False
         for p in patches:
             dialog_wait()
-            code, msg = git.git_cmd('./scripts/checkpatch.pl %s' % p)
+            code, msg = git.checkpatch(p)
             if code == 0:
                 continue
+            if self.answers is not None:
+                print('%s\n%s' % (_('commit.checkpatch_err'), msg))
+                err = True
+                if self.answers['checkpatch'] != 'ignore':
+                    return self.pause('re_commit')
+                continue
             code = d.scrollbox('%s\n%s' % (_('commit.checkpatch_err'), msg),
                                extra_button=True, extra_label=_('dialog.button_ignore'))
             clear_screen()
@@ -503,7 +673,9 @@ class CommitMachine:
             if code == d.OK:
                 return self.pause('re_commit')
 
-        if not err:
+        if not err and self.answers is not None:
+            print(_('commit.checkpatch_ok'))
+        elif not err:
             d.msgbox(_('commit.checkpatch_ok'))
             clear_screen()
 
@@ -538,8 +710,10 @@ class CommitMachine:
 
         return n('restore')
 
-    @staticmethod
-    def review_patch(patches):
+    def review_patch(self, patches):
+        if self.answers is not None:
+            return n('check_patch', patches)
+
         if d.yesno(_('commit.review')) == d.OK:
             for p in patches:
                 p = git.popen('vim %s' % p)
@@ -564,12 +738,21 @@ class CommitMachine:
             form.append((val, i, 1,
                         commit['meta'].get(key, ''), i, 15, 20, 40))
 
+        if self.answers is not None:
+            for key in meta_info.keys():
+                commit['meta'][key] = self.answers['tags'].get(
+                    key, commit['meta'].get(key, ''))
+            Commit.format_patch(commit, group_count)
+            return n('review_patch', [patch])
+
         code, results = d.form('''Meta info about this patch.
         Tag: tag, such as net-next, bpf-next
         Reported-by: reporter of this bug if any, such as:
                      Sample <sample@xx.com>
         Tested-by:   if this patch is tested by someone
         Acked-by:    if this patch is acked by someone
+        Reviewed-by: if this patch is reviewed by someone
+        Several people are separated by ';'
         ''', form)
 
         clear_screen()
@@ -585,19 +768,56 @@ class CommitMachine:
         return n('review_patch', [patch])
 
     def store(self):
-        if not os.path.exists(patch_path()):
-            os.mkdir(patch_path())
+        Commit.save_patch(self.commit)
+        self.warn_overlap([self.commit['key']])
+        return n('compile_test')
 
-        commit = self.commit
-        if commit['patch'] and os.path.exists(patch_path(commit['patch'])):
-            os.remove(patch_path(commit['patch']))
+    def warn_overlap(self, keys):
+        """
+        show the other open series which change the same lines as the
+        patches of keys, one of them will not apply after the other is
+        merged
+        """
+        found = overlap.conflicts(keys, Commit.get_commits())
+        if not found:
+            return
+        msg = '\n'.join([_('commit.overlap_warn')] + [
+            '%s: %s' % (series, ', '.join('%s (%s)' % i for i in hunks))
+            for (series, hunks) in sorted(found.items())])
+        if self.answers is not None:
+            print(msg)
+            return
+        d.msgbox(msg)
+        clear_screen()
 
-        patch = git.git_cmd_str('git format-patch -1 -o %s' % patch_path())
-        patch = os.path.basename(patch)
+    def compile_test(self):
+        """
+        build the objects touched by the patch, when a build dir is set
+        with 'autopatch build'
+        """
+        if not build.enabled() or getattr(self.args, 'no_build', False):
+            return n('set_tag')
 
-        commit['patch'] = patch
-        commit['title'] = git.get_last_title()
+        dialog_wait()
+        files = build.patch_files(patch_path(self.commit['patch']))
+        failed = build.test(files)
+        clear_screen()
+        if not failed:
+            return n('set_tag')
+
+        msg = '%s\n%s' % (_('commit.build_err'), '\n'.join(
+            '%s:\n%s' % (t, err) for (t, err) in failed))
+        if self.answers is not None:
+            print(msg)
+            if self.answers['build'] != 'ignore':
+                return self.pause('re_commit')
+            return n('set_tag')
 
+        code = d.scrollbox(msg, extra_button=True,
+                           extra_label=_('dialog.button_ignore'))
+        clear_screen()
+        if code == d.OK:
+            return self.pause('re_commit')
         return n('set_tag')
 
     def make_cover(self, group):
@@ -608,18 +828,24 @@ class CommitMachine:
         self.commit = first
 
         cover = first.get('cover')
-        tmp_file = NamedTemporaryFile('w+')
-        if cover:
-            tmp_file.write(cover)
-            tmp_file.flush()
-            tmp_file.seek(0)
-        p = git.popen('vim %s' % tmp_file.name)
-        p.communicate()
-
-        cover = tmp_file.read()
-        tmp_file.close()
-        if not cover:
-            return n()
+        if self.answers is not None:
+            cover = self.answers.text('cover') or cover
+            if not cover:
+                print(_('commit.headless_no_cover'))
+                return n()
+        else:
+            tmp_file = NamedTemporaryFile('w+')
+            if cover:
+                tmp_file.write(cover)
+                tmp_file.flush()
+                tmp_file.seek(0)
+            p = git.popen('vim %s' % tmp_file.name)
+            p.communicate()
+
+            cover = tmp_file.read()
+            tmp_file.close()
+            if not cover:
+                return n()
 
         first['cover'] = cover
         tmp = TemporaryDirectory()
@@ -650,6 +876,41 @@ class CommitMachine:
 
         return n('review_patch', [patch_path(g['patch']) for g in groups])
 
+    def check_series(self, group):
+        """
+        make sure that every prefix of the series builds before it is sent,
+        when the compile test is enabled
+        """
+        if not build.enabled() or getattr(self.args, 'no_build', False):
+            return n('make_cover', group)
+
+        groups = Commit.find_group(group)
+        dialog_wait()
+        shas = git.git_cmd_str('git rev-list --reverse -%d HEAD' %
+                               len(groups))
+        res = build.test_series((shas or '').split())
+        clear_screen()
+        if not res:
+            self.answers is not None and print(_('commit.series_ok'))
+            return n('make_cover', group)
+
+        (i, failed) = res
+        msg = '%s\n%s' % (_('commit.series_err').format(
+            order=i + 1, count=len(groups), title=groups[i]['title']),
+            '\n'.join('%s:\n%s' % (t, err) for (t, err) in failed))
+        if self.answers is not None:
+            print(msg)
+            if self.answers['build'] != 'ignore':
+                return n()
+            return n('make_cover', group)
+
+        code = d.scrollbox(msg, extra_button=True,
+                           extra_label=_('dialog.button_ignore'))
+        clear_screen()
+        if code == d.OK:
+            return n()
+        return n('make_cover', group)
+
     @staticmethod
     def send_group(group):
         groups = Commit.find_group(group)
@@ -657,10 +918,16 @@ class CommitMachine:
             print('invalid group')
             return n()
 
-        return n('make_cover', group)
+        return n('check_series', group)
+
+    def select_template(self):
+        if self.answers is not None:
+            template = get_template(self.answers['template'])
+            if not template:
+                print('template not found: %s' % self.answers['template'])
+                return n()
+            return n('do_commit', template)
 
-    @staticmethod
-    def select_template():
         dialog_wait()
         templates = get_templates()
         if not templates:
@@ -676,10 +943,26 @@ class CommitMachine:
 
     def do_commit(self, template):
         group = self.args.group or 0
-        if not self.args.no_add:
-            git.git_cmd_str('git add ./')
-        p = git.popen('git commit -t %s' % template)
+        if not self.args.no_add and not git.stage_changes():
+            return n()
+
+        tmp = None
+        if self.answers is not None:
+            msg = self.answers.text('message')
+            if not msg:
+                print(_('commit.headless_no_message'))
+                git.git_cmd_str('git reset HEAD')
+                return n()
+            tmp = NamedTemporaryFile('w+t')
+            tmp.write(msg)
+            tmp.flush()
+            p = git.popen('git commit -F %s' % tmp.name)
+        else:
+            tmp = self.prefill_template(template)
+            p = git.popen('git commit -t %s' % (tmp.name if tmp else
+                                                 template))
         p.communicate()
+        tmp and tmp.close()
 
         if p.returncode != 0:
             print(_('commit.no_commit'))
@@ -688,30 +971,146 @@ class CommitMachine:
 
         git.git_cmd_str('git commit -s --amend --no-edit')
         self.commit = Commit.add_commit(
-            git.get_last_title(), git.get_last_sid(), group, Commit.get_next_order(group))
+            git.get_last_title(), git.get_last_sid(), group,
+            Commit.get_next_order(group, self.answers))
+
+        return n('lint_commit')
+
+    @staticmethod
+    def prefill_template(template):
+        """
+        the template with the subject prefix most used in the history of
+        the staged files. The index is only updated here, it is built by
+        'repo prefix' or 'repo optimize'.
+        :return: the temporary file of the template, None to use it as is
+        """
+        paths = git.staged_paths()
+        if not paths:
+            return None
+        try:
+            if not prefixes.built():
+                return None
+            prefixes.update()
+            best = prefixes.suggest(paths)
+        except sqlite3.Error:
+            return None
+        if not best:
+            return None
+        tmp = NamedTemporaryFile('w+t')
+        tmp.write(prefixes.fill_template(template, best[0][0]))
+        tmp.flush()
+        return tmp
+
+    def lint_commit(self):
+        """
+        check the message of the new commit before any patch is generated
+        """
+        errors, warnings = lint.lint_head()
+        if not errors and not warnings:
+            return n('store')
+
+        msg = '\n'.join(['%s\n' % _('commit.lint_err')] +
+                        ['error: %s' % i for i in errors] +
+                        ['warning: %s' % i for i in warnings])
+        if self.answers is not None:
+            print(msg)
+            if errors and self.answers['lint'] != 'ignore':
+                return self.pause('re_commit')
+            return n('store')
 
+        code = d.scrollbox(msg, extra_button=True,
+                           extra_label=_('dialog.button_ignore'))
+        clear_screen()
+        if code == d.OK:
+            return self.pause('re_commit')
         return n('store')
 
     def import_patch(self):
         patch = self.args.do_patch
         group = self.args.group or 0
-        if not git.custom_am(patch):
+        tmp = TemporaryDirectory()
+        patches = git.collect_patches(patch, tmp.name)
+        if not patches:
+            tmp.cleanup()
+            print(_('commit.import_fail'))
+            return n()
+        if len(patches) > 1 or os.path.isdir(patch):
+            return n('import_series', (patches, tmp))
+
+        # ask for the group before anything is applied
+        order = Commit.get_next_order(group, self.answers)
+        if isinstance(order, tuple):
+            tmp.cleanup()
+            return order
+        # the patch split out of an mbox, without its cover letter
+        applied = git.custom_am(patches[0])
+        tmp.cleanup()
+        if not applied:
             print(_('commit.import_fail'))
             return n()
 
-        p = git.popen('git commit -s --amend')
+        p = git.popen('git commit -s --amend%s' % (
+            ' --no-edit' if self.answers is not None else ''))
         p.communicate()
         commit = Commit.add_commit(
-            git.get_last_title(), git.get_last_sid(), group, Commit.get_next_order(group))
+            git.get_last_title(), git.get_last_sid(), group, order)
         self.commit = commit
         return n('store')
 
+    def import_series(self, info):
+        """
+        apply a series in one 'git am' pass, then store every patch of it in
+        the group with one 'git format-patch'
+        """
+        patches, tmp = info
+        path = os.path.normpath(self.args.do_patch)
+        group = self.args.group or os.path.basename(path).split('.')[0]
+        base = git.git_cmd_str('git rev-parse HEAD')
+        order = Commit.get_next_order(group, self.answers)
+        if isinstance(order, tuple):
+            tmp.cleanup()
+            return order
+
+        cmd = 'git am -3 --signoff %s%s' % (
+            '-i ' if self.args.edit else '',
+            ' '.join('"%s"' % i for i in patches))
+        p = git.popen(cmd)
+        p.communicate()
+        tmp.cleanup()
+        if p.returncode != 0:
+            git.git_cmd('git am --abort')
+            print(_('commit.import_fail'))
+            return n()
+
+        logs = git.git_cmd_str('git log --reverse --format=%%h%%x09%%s %s..HEAD' % base)
+        if not logs:
+            return n()
+
+        if not os.path.exists(patch_path()):
+            os.mkdir(patch_path())
+        files = git.git_cmd_str('git format-patch -o %s %s..HEAD' % (patch_path(), base))
+        files = files.splitlines()
+
+        logs = logs.splitlines()
+        for i in range(len(logs)):
+            sid, title = logs[i].split('\t', 1)
+            commit = Commit.add_commit(title, sid, group, order + i)
+            commit['patch'] = os.path.basename(files[i])
+            Commit.set_status(commit, 'set_tag')
+            search.update(commit)
+            overlap.update(commit)
+            print('import commit:%s' % title)
+        Commit.store_commit()
+
+        return n()
+
     def confirm_commit(self):
-        if self.args.no_add:
+        if self.args.no_add or self.answers is not None:
             return n('select_template')
 
         dialog_wait()
-        changes = git.git_cmd_str('git status --short')
+        changes = '\n'.join('%s %s' % (status, ' -> '.join(reversed(paths)))
+                            for (status, paths) in git.status())
 
         msg = '%s\n%s' % (_('commit.commit'), changes)
         code = d.scrollbox(msg,
@@ -0,0 +1,184 @@
+import os
+import re
+import sqlite3
+
+from config import wconfig_dir, patch_path, file_stat
+from upstream import closed_status
+
+index_file = os.path.join(wconfig_dir, 'overlap.db')
+hunk_re = re.compile(r'^@@ -(\d+)(?:,(\d+))? ')
+
+db = None
+
+
+def connect():
+    global db
+    if db is None:
+        db = sqlite3.connect(index_file)
+        db.executescript('''
+            CREATE TABLE IF NOT EXISTS docs (key TEXT PRIMARY KEY, sig TEXT);
+            CREATE TABLE IF NOT EXISTS hunks (path TEXT, start INTEGER,
+                                              end INTEGER, key TEXT);
+            CREATE INDEX IF NOT EXISTS hunks_path ON hunks (path, start);
+            CREATE INDEX IF NOT EXISTS hunks_key ON hunks (key);
+        ''')
+    return db
+
+
+def hunks_of(data):
+    """
+    the lines of the original files a patch needs, context included, as
+    (path, first line, last line). A new file is line 0 of its path.
+    """
+    hunks = []
+    path = None
+    for line in data.splitlines():
+        if line.startswith('diff --git '):
+            m = re.match(r'^diff --git a/(.*) b/', line)
+            path = m.group(1) if m else None
+            continue
+        m = path and hunk_re.match(line)
+        if m:
+            start = int(m.group(1))
+            count = int(m.group(2) or 1)
+            hunks.append((path, start, start + max(count, 1) - 1))
+    return hunks
+
+
+def signature(commit):
+    if not commit.get('patch'):
+        return None
+    return str(file_stat(patch_path(commit['patch'])))
+
+
+def update(commit):
+    """
+    (re)index the hunks of the patch of a commit, when it changed
+    """
+    conn = connect()
+    sig = signature(commit)
+    row = conn.execute('SELECT sig FROM docs WHERE key = ?',
+                       (commit['key'],)).fetchone()
+    if row and row[0] == sig:
+        return
+    with conn:
+        index_doc(conn, commit, sig)
+
+
+def index_doc(conn, commit, sig):
+    key = commit['key']
+    conn.execute('DELETE FROM hunks WHERE key = ?', (key,))
+    conn.execute('INSERT OR REPLACE INTO docs VALUES (?, ?)', (key, sig))
+    if sig == 'None' or sig is None:
+        return
+    with open(patch_path(commit['patch']), 'r', errors='replace') as f:
+        hunks = hunks_of(f.read())
+    conn.executemany('INSERT INTO hunks VALUES (?, ?, ?, ?)',
+                     [h + (key,) for h in hunks])
+
+
+def remove(key):
+    conn = connect()
+    with conn:
+        conn.execute('DELETE FROM hunks WHERE key = ?', (key,))
+        conn.execute('DELETE FROM docs WHERE key = ?', (key,))
+
+
+def sync(commits, prune=False):
+    """
+    bring the index up to date with the stored patches, see search.sync
+    """
+    conn = connect()
+    known = dict(conn.execute('SELECT key, sig FROM docs'))
+    with conn:
+        for c in commits:
+            sig = signature(c)
+            if known.pop(c['key'], -1) != sig:
+                index_doc(conn, c, sig)
+        for key in (known if prune else []):
+            conn.execute('DELETE FROM hunks WHERE key = ?', (key,))
+            conn.execute('DELETE FROM docs WHERE key = ?', (key,))
+
+
+def series_of(commit):
+    return 'group:%s' % commit['group'] if commit['group'] else commit['key']
+
+
+def open_series(commits):
+    """
+    :return: dict of key -> series of the open patches
+    """
+    return {c['key']: series_of(c) for c in commits
+            if c.get('status') not in closed_status and c.get('patch')}
+
+
+def conflicts(keys, commits):
+    """
+    the hunks of the other open series which overlap the patches of keys
+    :return: dict of series -> sorted list of (path, key)
+    """
+    if not keys:
+        return {}
+    sync(commits)
+    series = open_series(commits)
+    mine = set(series.get(k) for k in keys) | set(keys)
+    found = {}
+    rows = connect().execute(
+        'SELECT o.key, o.path FROM hunks h JOIN hunks o '
+        'ON o.path = h.path AND o.start <= h.end AND o.end >= h.start '
+        'WHERE h.key IN (%s)' % ','.join('?' * len(keys)), list(keys))
+    for (key, path) in rows:
+        if key in series and series[key] not in mine:
+            found.setdefault(series[key], set()).add((path, key))
+    return {s: sorted(v) for (s, v) in found.items()}
+
+
+def overlap_sets(commits):
+    """
+    find the open series whose patches need the same lines, with one sweep
+    over the hunks sorted by path and first line
+    :return: list of (series, paths) of the connected series, the largest
+             first
+    """
+    sync(commits)
+    series = open_series(commits)
+    parent = {}
+
+    def find(s):
+        while parent.setdefault(s, s) != s:
+            parent[s] = parent[parent[s]]
+            s = parent[s]
+        return s
+
+    paths = {}
+    active = []
+    last_path = None
+    for (path, start, end, key) in connect().execute(
+            'SELECT path, start, end, key FROM hunks ORDER BY path, start'):
+        if key not in series:
+            continue
+        if path != last_path:
+            active = []
+            last_path = path
+        active = [i for i in active if i[0] >= start]
+        s = series[key]
+        for (other_end, other) in active:
+            if other != s:
+                parent[find(other)] = find(s)
+                paths.setdefault((other, s), set()).add(path)
+        active.append((end, s))
+
+    sets = {}
+    for s in list(parent):
+        sets.setdefault(find(s), set()).add(s)
+    result = []
+    for members in sets.values():
+        if len(members) < 2:
+            continue
+        files = set()
+        for ((a, b), p) in paths.items():
+            if a in members:
+                files |= p
+        result.append((sorted(members), sorted(files)))
+    result.sort(key=lambda x: len(x[0]), reverse=True)
+    return result
@@ -0,0 +1,188 @@
+import os
+import re
+import sqlite3
+import subprocess
+
+from config import wconfig_dir
+from git import git
+
+index_file = os.path.join(wconfig_dir, 'prefix.db')
+# how far back the first build reads the history, the prefixes of older
+# commits are often out of date anyway
+since = '3 years ago'
+# commits touching more files are treewide changes, their prefixes tell
+# nothing about the files
+max_files = 30
+# (path, prefix) pairs kept in memory before they are written
+flush_every = 100000
+prefix_re = re.compile(r'^((?:[\w.,/+-]+: )+)\S')
+
+db = None
+
+
+def connect():
+    global db
+    if db is None:
+        db = sqlite3.connect(index_file)
+        db.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY,
+                                             value TEXT);
+            CREATE TABLE IF NOT EXISTS prefixes (
+                path TEXT, prefix TEXT, count INTEGER, last INTEGER,
+                PRIMARY KEY (path, prefix)) WITHOUT ROWID;
+        ''')
+    return db
+
+
+def prefix_of(subject):
+    """
+    the subject prefix of a commit, such as 'net: ipv4' of
+    'net: ipv4: fix a bug in somewhere', None when there is none
+    """
+    m = prefix_re.match(subject)
+    return m.group(1)[:-2] if m else None
+
+
+def log_commits(out):
+    """
+    parse the output of git log --format=%x00%ct%x09%s --name-only
+    :return: iterator of (commit time, subject, files)
+    """
+    head = None
+    files = []
+    for line in out:
+        line = line.decode('utf-8', 'replace').rstrip('\n')
+        if line.startswith('\0'):
+            if head:
+                yield int(head[0]), head[1], files
+            head = (line[1:].split('\t', 1) + [''])[:2]
+            files = []
+        elif line:
+            files.append(line)
+    if head:
+        yield int(head[0]), head[1], files
+
+
+def flush(conn, counts):
+    conn.executemany('''
+        INSERT INTO prefixes VALUES (?, ?, ?, ?)
+        ON CONFLICT (path, prefix) DO UPDATE SET
+            count = count + excluded.count,
+            last = max(last, excluded.last)
+    ''', ((path, prefix, c[0], c[1])
+          for ((path, prefix), c) in counts.items()))
+    counts.clear()
+
+
+def built():
+    """
+    whether the index was built once, by 'repo prefix' or 'repo optimize'
+    """
+    if not os.path.exists(index_file):
+        return False
+    row = connect().execute(
+        "SELECT value FROM meta WHERE name = 'tip'").fetchone()
+    return bool(row)
+
+
+def update():
+    """
+    index the prefixes of the commits added to HEAD since the last update,
+    with one streaming git log. The first update reads the history since
+    the 'since' date.
+    :return: number of commits read, None when already up to date
+    """
+    conn = connect()
+    tip = git.rev('HEAD')
+    row = conn.execute("SELECT value FROM meta WHERE name = 'tip'").fetchone()
+    last = row[0] if row else None
+    if not tip or tip == last:
+        return None
+    if last and git.rev(last + '^{commit}'):
+        revs = '%s..%s' % (last, tip)
+    else:
+        revs = '--since="%s" %s' % (since, tip)
+
+    cmd = 'git log --no-merges --format=%%x00%%ct%%x09%%s --name-only %s' % \
+        revs
+    p = git.popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    n = 0
+    counts = {}
+    with conn:
+        for (time, subject, files) in log_commits(p.stdout):
+            n += 1
+            prefix = prefix_of(subject)
+            if not prefix or len(files) > max_files:
+                continue
+            for f in files:
+                c = counts.setdefault((f, prefix), [0, 0])
+                c[0] += 1
+                c[1] = max(c[1], time)
+            if len(counts) >= flush_every:
+                flush(conn, counts)
+        p.stdout.close()
+        if p.wait() != 0:
+            conn.rollback()
+            return None
+        flush(conn, counts)
+        conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                     ('tip', tip))
+    return n
+
+
+def candidates(conn, path):
+    """
+    the prefixes used on a path as (prefix, count, last), or for a new
+    file, those of the nearest directory with history
+    """
+    rows = conn.execute('SELECT prefix, count, last FROM prefixes '
+                        'WHERE path = ?', (path,)).fetchall()
+    parts = path.split('/')[:-1]
+    while not rows and parts:
+        d = '/'.join(parts)
+        rows = conn.execute('SELECT prefix, SUM(count), MAX(last) '
+                            'FROM prefixes WHERE path > ? AND path < ? '
+                            'GROUP BY prefix', (d + '/', d + '0')).fetchall()
+        parts.pop()
+    return rows
+
+
+def suggest(paths):
+    """
+    the likely subject prefixes of a change of the paths. Every path votes
+    for the prefixes used on it by their share, so that a file with a long
+    history does not outweigh the others; the most recent use breaks ties.
+    :return: list of (prefix, score), the best first
+    """
+    conn = connect()
+    scores = {}
+    for path in paths:
+        rows = candidates(conn, path)
+        total = sum(r[1] for r in rows)
+        for (prefix, count, last) in rows:
+            s = scores.setdefault(prefix, [0, 0])
+            s[0] += count / total
+            s[1] = max(s[1], last)
+    best = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    return [(prefix, s[0] / len(paths)) for (prefix, s) in best]
+
+
+def fill_template(template, prefix):
+    """
+    the text of a commit template with the subject prefix filled in: it
+    replaces the 'module' of a subject, or starts the subject where the
+    template leaves it empty
+    """
+    with open(template, 'r') as f:
+        lines = f.read().splitlines(True)
+    for (i, line) in enumerate(lines):
+        if line.startswith('#'):
+            continue
+        if line.startswith('module:'):
+            lines[i] = prefix + line[len('module'):]
+        else:
+            lines.insert(i, '%s: \n' % prefix)
+        break
+    else:
+        lines.append('%s: \n' % prefix)
+    return ''.join(lines)
@@ -0,0 +1,134 @@
+import os
+import re
+import sqlite3
+
+from config import wconfig_dir, patch_path, file_stat
+
+index_file = os.path.join(wconfig_dir, 'search.db')
+token_re = re.compile(r'[A-Za-z0-9_]{2,}')
+
+db = None
+
+
+def connect():
+    global db
+    if db is None:
+        db = sqlite3.connect(index_file)
+        db.executescript('''
+            CREATE TABLE IF NOT EXISTS docs (key TEXT PRIMARY KEY, sig TEXT);
+            CREATE TABLE IF NOT EXISTS postings (token TEXT, key TEXT);
+            CREATE INDEX IF NOT EXISTS postings_token ON postings (token);
+            CREATE INDEX IF NOT EXISTS postings_key ON postings (key);
+        ''')
+    return db
+
+
+def tokens_of(data):
+    """
+    the tokens of a patch: the words of the commit message, the added and
+    removed lines and the touched paths, but not the context lines
+    """
+    tokens = set()
+    in_diff = False
+    for line in data.splitlines():
+        if line.startswith('diff --git '):
+            in_diff = True
+            paths = line.split()[2:]
+            for p in paths:
+                p = p[2:].lower()
+                tokens.add(p)
+                parts = p.split('/')
+                tokens.update('/'.join(parts[:i]) + '/'
+                              for i in range(1, len(parts)))
+            continue
+        if in_diff and not line.startswith(('+', '-')) or \
+                line.startswith(('+++ ', '--- ', 'index ')):
+            continue
+        tokens.update(t.lower() for t in token_re.findall(line))
+    return tokens
+
+
+def signature(commit):
+    if not commit.get('patch'):
+        return None
+    return str(file_stat(patch_path(commit['patch'])))
+
+
+def update(commit):
+    """
+    (re)index the patch of a commit, when it changed
+    """
+    conn = connect()
+    sig = signature(commit)
+    row = conn.execute('SELECT sig FROM docs WHERE key = ?',
+                       (commit['key'],)).fetchone()
+    if row and row[0] == sig:
+        return
+    with conn:
+        index_doc(conn, commit, sig)
+
+
+def index_doc(conn, commit, sig):
+    key = commit['key']
+    conn.execute('DELETE FROM postings WHERE key = ?', (key,))
+    conn.execute('INSERT OR REPLACE INTO docs VALUES (?, ?)', (key, sig))
+    if sig == 'None' or sig is None:
+        return
+    with open(patch_path(commit['patch']), 'r', errors='replace') as f:
+        tokens = tokens_of(f.read())
+    tokens.update(t.lower() for t in token_re.findall(commit['title']))
+    conn.executemany('INSERT INTO postings VALUES (?, ?)',
+                     ((t, key) for t in tokens))
+
+
+def remove(key):
+    conn = connect()
+    with conn:
+        conn.execute('DELETE FROM postings WHERE key = ?', (key,))
+        conn.execute('DELETE FROM docs WHERE key = ?', (key,))
+
+
+def sync(commits, prune=False):
+    """
+    bring the index up to date with the stored patches, in case they were
+    changed behind autopatch. Only the stat of the patch files is read for
+    the ones that did not change.
+    :param prune: commits is the full list, drop the other ones
+    """
+    conn = connect()
+    known = dict(conn.execute('SELECT key, sig FROM docs'))
+    with conn:
+        for c in commits:
+            sig = signature(c)
+            if known.pop(c['key'], -1) != sig:
+                index_doc(conn, c, sig)
+        for key in (known if prune else []):
+            conn.execute('DELETE FROM postings WHERE key = ?', (key,))
+            conn.execute('DELETE FROM docs WHERE key = ?', (key,))
+
+
+def query(expr, commits):
+    """
+    find the commits whose patch has all the terms of expr. A term ending
+    with '*' matches as a prefix, and paths such as 'net/core/' match all
+    the files below them.
+    :return: the matching commits, in the order of commits
+    """
+    sync(commits)
+    conn = connect()
+    keys = None
+    for term in expr.lower().split():
+        if term.endswith('*'):
+            prefix = term.rstrip('*')
+            rows = conn.execute('SELECT key FROM postings WHERE token >= ? '
+                                'AND token < ?', (prefix, prefix + '\uffff'))
+        else:
+            rows = conn.execute('SELECT key FROM postings WHERE token = ?',
+                                (term,))
+        found = set(r[0] for r in rows)
+        keys = found if keys is None else keys & found
+        if not keys:
+            return []
+    if keys is None:
+        return list(commits)
+    return [c for c in commits if c['key'] in keys]
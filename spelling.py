@@ -0,0 +1,267 @@
+import mmap
+import os
+import re
+from multiprocessing import Pool
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+word_chars = b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_'
+# bytes decoded at a time for pyahocorasick
+chunk_size = 1 << 20
+
+
+def load_words(*files):
+    """
+    load misspellings in the format of the kernel's scripts/spelling.txt:
+    'typo||correction' per line
+    :return: dict of lower case typo -> correction
+    """
+    words = {}
+    for path in files:
+        if not path or not os.path.exists(path):
+            continue
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#') or '||' not in line:
+                    continue
+                typo, fix = line.split('||', 1)
+                words[typo.strip().lower()] = fix.strip()
+    return words
+
+
+def trie_regex(words):
+    """
+    build one regular expression from the trie of all the words, so that
+    the C regex engine walks the trie instead of trying every word. It
+    ignores the case, so it can scan a mmap in place.
+    """
+    trie = {}
+    for w in words:
+        node = trie
+        for c in w:
+            node = node.setdefault(c, {})
+        node[''] = True
+
+    def build(node):
+        alts = [re.escape(c) + build(node[c]) for c in sorted(node) if c]
+        if not alts:
+            return ''
+        if len(alts) == 1 and '' not in node:
+            return alts[0]
+        return '(?:%s)%s' % ('|'.join(alts), '?' if '' in node else '')
+
+    pattern = r'\b%s\b' % build(trie)
+    return re.compile(pattern.encode('latin-1'), re.IGNORECASE)
+
+
+class Matcher:
+    """
+    Multi-pattern matcher of whole words. pyahocorasick is used when it is
+    installed, otherwise the words are compiled into a trie-shaped regex.
+    """
+
+    def __init__(self, words):
+        self.automaton = None
+        self.regex = None
+        self.longest = max((len(w) for w in words), default=0)
+        if ahocorasick:
+            self.automaton = ahocorasick.Automaton()
+            for w in words:
+                self.automaton.add_word(w, w)
+            self.automaton.make_automaton()
+        else:
+            self.regex = trie_regex(words)
+
+    def find(self, data):
+        """
+        :param data: bytes or an mmap, which is scanned in place
+        :return: iterator of (offset, matched bytes)
+        """
+        if self.regex:
+            for m in self.regex.finditer(data):
+                yield m.start(), m.group()
+            return
+
+        # pyahocorasick needs str, so decode a chunk at a time, overlapping
+        # by the longest word so that no match is cut
+        for base in range(0, len(data), chunk_size):
+            text = data[base:base + chunk_size + self.longest].decode(
+                'latin-1').lower()
+            for (end, word) in self.automaton.iter(text):
+                start = base + end - len(word) + 1
+                end += base
+                if start >= base + chunk_size:
+                    continue
+                if start > 0 and data[start - 1] in word_chars:
+                    continue
+                if end + 1 < len(data) and data[end + 1] in word_chars:
+                    continue
+                yield start, data[start:end + 1]
+
+
+matcher = None
+
+
+def init_worker(words):
+    global matcher
+    matcher = Matcher(words)
+
+
+def scan_file(path):
+    hits = []
+    try:
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return path, hits
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                # skip binary files
+                if m.find(b'\0', 0, 8000) != -1:
+                    return path, hits
+                line = 1
+                last = 0
+                for (offset, word) in matcher.find(m):
+                    line += m[last:offset].count(b'\n')
+                    last = offset
+                    hits.append((line, offset, word.decode('latin-1')))
+    except (OSError, ValueError):
+        pass
+    return path, hits
+
+
+def scan(root, files, words, jobs=None):
+    """
+    scan the files in parallel
+    :param root: the kernel tree
+    :param files: paths relative to root
+    :param words: dict returned by load_words
+    :return: list of hits: (path, line, offset, word, correction)
+    """
+    paths = [os.path.join(root, f) for f in files]
+    hits = []
+    with Pool(jobs, initializer=init_worker, initargs=(list(words),)) as pool:
+        for (path, found) in pool.imap_unordered(scan_file, paths, 64):
+            path = os.path.relpath(path, root)
+            for (line, offset, word) in found:
+                hits.append((path, line, offset, word,
+                             match_case(word, words[word.lower()])))
+    hits.sort()
+    return hits
+
+
+def match_case(word, fix):
+    if word.isupper() and len(word) > 1:
+        return fix.upper()
+    if word[0].isupper():
+        return fix[0].upper() + fix[1:]
+    return fix
+
+
+def fix_files(root, hits):
+    """
+    replace the misspellings in the files
+    """
+    files = {}
+    for h in hits:
+        files.setdefault(h[0], []).append(h)
+    for (path, items) in files.items():
+        path = os.path.join(root, path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        for (_, _, offset, word, fix) in sorted(items, key=lambda x: -x[2]):
+            data = data[:offset] + fix.encode('latin-1') + \
+                data[offset + len(word):]
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+class Maintainers:
+    """
+    Find the MAINTAINERS section of a path, the most specific F: pattern
+    wins like in get_maintainer.pl.
+    """
+
+    def __init__(self, path):
+        self.plain = {}
+        self.globs = []
+        if not os.path.exists(path):
+            return
+
+        with open(path, 'r', errors='replace') as f:
+            lines = f.read().splitlines()
+        for i in range(len(lines)):
+            if lines[i].startswith('Maintainers List'):
+                lines = lines[i + 1:]
+                break
+
+        section = None
+        for line in lines:
+            if not line.strip():
+                section = None
+                continue
+            m = re.match(r'^([A-Z]):\s*(.*)$', line)
+            if not m:
+                section = section or line.strip()
+                continue
+            if not section or m.group(1) != 'F':
+                continue
+            self.add(m.group(2).strip(), section)
+
+    def add(self, pattern, section):
+        depth = pattern.rstrip('/').count('/') + 1
+        if '*' not in pattern and '?' not in pattern:
+            self.plain.setdefault(pattern.rstrip('/'), []).append(
+                (depth, len(pattern), section))
+            return
+        regex = re.escape(pattern).replace('\\*', '.*').replace('\\?', '.')
+        self.globs.append((re.compile('^' + regex), (depth, len(pattern),
+                                                     section)))
+
+    def find(self, path):
+        found = []
+        parts = path.split('/')
+        for i in range(len(parts), 0, -1):
+            found += self.plain.get('/'.join(parts[:i]), [])
+        found += [item for (regex, item) in self.globs if regex.match(path)]
+        if not found:
+            return 'THE REST'
+        return max(found)[2]
+
+
+def subject_prefix(files):
+    """
+    guess the subject prefix from the common directory of the files, such
+    as 'net: ipv4' for net/ipv4/ or 'e1000e' for drivers/net/.../e1000e/
+    """
+    common = os.path.commonpath([os.path.dirname(f) or '.' for f in files])
+    parts = [i for i in common.split('/') if i and i != '.']
+    if not parts:
+        return 'treewide'
+    if parts[0] in ['drivers', 'sound', 'arch'] and len(parts) > 1:
+        return parts[-1]
+    return ': '.join(parts[:2])
+
+
+def group_hits(hits, maintainers):
+    groups = {}
+    sections = {}
+    for h in hits:
+        if h[0] not in sections:
+            sections[h[0]] = maintainers.find(h[0])
+        groups.setdefault(sections[h[0]], []).append(h)
+    return groups
+
+
+def commit_message(files, hits):
+    """
+    the commit message of the fixes of a MAINTAINERS section: the subject
+    prefix of the files and the list of the fixes
+    """
+    fixes = sorted(set('%s ==> %s' % (h[3], h[4]) for h in hits))
+    return '\n'.join(
+        ['%s: fix misspellings' % subject_prefix(files), '',
+         'Fix the misspellings listed in scripts/spelling.txt:', ''] +
+        ['  ' + i for i in fixes]) + '\n'
@@ -0,0 +1,171 @@
+import os
+from datetime import datetime, timedelta
+
+
+def parse_time(s):
+    """
+    fast path of strptime(s, '%Y-%m-%d %H:%M:%S'), which is the format
+    used for every timestamp in the workspace
+    """
+    return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                    int(s[11:13]), int(s[14:16]), int(s[17:19]))
+
+
+def week_of(t):
+    year, week, _ = t.isocalendar()
+    return '%d-W%02d' % (year, week)
+
+
+def quantile(values, q):
+    """
+    :param values: sorted values
+    """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def compute(commits, now=None):
+    """
+    compute workspace aggregates in a single pass over the commits and
+    their status events
+    """
+    now = now or datetime.now()
+    status = {}
+    sent_weeks = {}
+    created_weeks = {}
+    versions = {}
+    to_applied = []
+    re_commit = []
+    sent_7d = 0
+
+    for c in commits:
+        s = c.get('status') or 'none'
+        status[s] = status.get(s, 0) + 1
+        versions[c['version']] = versions.get(c['version'], 0) + 1
+        w = week_of(c['create'])
+        created_weeks[w] = created_weeks.get(w, 0) + 1
+
+        first_send = None
+        applied = None
+        events = c.get('events') or []
+        for i in range(len(events)):
+            t, s = events[i][0], events[i][1]
+            if s == 'finish' and not first_send:
+                first_send = parse_time(t)
+            elif s == 'applied' and not applied:
+                applied = parse_time(t)
+            elif s == 're_commit':
+                end = parse_time(events[i + 1][0]) \
+                    if i + 1 < len(events) else now
+                re_commit.append((end - parse_time(t)).total_seconds())
+
+        if first_send:
+            w = week_of(first_send)
+            sent_weeks[w] = sent_weeks.get(w, 0) + 1
+            if now - first_send <= timedelta(days=7):
+                sent_7d += 1
+            if applied and applied >= first_send:
+                to_applied.append((applied - first_send).total_seconds())
+
+    to_applied.sort()
+    re_commit.sort()
+    return {
+        'total': len(commits),
+        'status': status,
+        'created_weeks': created_weeks,
+        'sent_weeks': sent_weeks,
+        'sent_7d': sent_7d,
+        'versions': versions,
+        'to_applied': to_applied,
+        're_commit': re_commit,
+    }
+
+
+def summary(values):
+    return {
+        'count': len(values),
+        'sum': sum(values),
+        'avg': sum(values) / len(values) if values else 0,
+        '0.5': quantile(values, 0.5),
+        '0.9': quantile(values, 0.9),
+    }
+
+
+def show(data, weeks=12):
+    def days(v):
+        return '%.1fd' % (v / 86400)
+
+    def hours(v):
+        return '%.1fh' % (v / 3600)
+
+    print('patches: %d' % data['total'])
+    for (k, v) in sorted(data['status'].items()):
+        print('  %-12s %d' % (k, v))
+
+    print('\n%-10s %8s %8s' % ('week', 'created', 'sent'))
+    all_weeks = sorted(set(data['created_weeks']) | set(data['sent_weeks']))
+    for w in all_weeks[-weeks:]:
+        print('%-10s %8d %8d' % (w, data['created_weeks'].get(w, 0),
+                                 data['sent_weeks'].get(w, 0)))
+
+    versions = data['versions']
+    count = sum(versions.values())
+    print('\nversions: avg %.2f, max %d' % (
+        sum(k * v for (k, v) in versions.items()) / count if count else 0,
+        max(versions) if versions else 0))
+    for (k, v) in sorted(versions.items()):
+        print('  v%-11d %d' % (k, v))
+
+    s = summary(data['to_applied'])
+    print('\nfirst send -> applied: %d patches, avg %s, median %s, p90 %s' % (
+        s['count'], days(s['avg']), days(s['0.5']), days(s['0.9'])))
+    s = summary(data['re_commit'])
+    print('time in re_commit: %d times, avg %s, median %s, p90 %s' % (
+        s['count'], hours(s['avg']), hours(s['0.5']), hours(s['0.9'])))
+
+
+def write_prometheus(data, path, workspace=''):
+    """
+    write a snapshot in the textfile format of the node exporter. The file
+    is replaced atomically, so the exporter never sees a partial file.
+    """
+    label = 'workspace="%s"' % workspace
+    lines = [
+        '# HELP autopatch_patches Number of patches by status.',
+        '# TYPE autopatch_patches gauge',
+    ]
+    for (k, v) in sorted(data['status'].items()):
+        lines.append('autopatch_patches{%s,status="%s"} %d' % (label, k, v))
+
+    lines += [
+        '# HELP autopatch_patches_sent_7d Patches sent for the first time '
+        'in the last 7 days.',
+        '# TYPE autopatch_patches_sent_7d gauge',
+        'autopatch_patches_sent_7d{%s} %d' % (label, data['sent_7d']),
+        '# HELP autopatch_patch_versions Number of patches by version.',
+        '# TYPE autopatch_patch_versions gauge',
+    ]
+    for (k, v) in sorted(data['versions'].items()):
+        lines.append('autopatch_patch_versions{%s,version="%d"} %d' % (
+            label, k, v))
+
+    for (name, values, desc) in (
+            ('autopatch_send_to_applied_seconds', data['to_applied'],
+             'Time from the first send of a patch to it being applied.'),
+            ('autopatch_re_commit_seconds', data['re_commit'],
+             'Time patches stayed in the re_commit status.')):
+        s = summary(values)
+        lines += [
+            '# HELP %s %s' % (name, desc),
+            '# TYPE %s summary' % name,
+            '%s{%s,quantile="0.5"} %.0f' % (name, label, s['0.5']),
+            '%s{%s,quantile="0.9"} %.0f' % (name, label, s['0.9']),
+            '%s_sum{%s} %.0f' % (name, label, s['sum']),
+            '%s_count{%s} %d' % (name, label, s['count']),
+        ]
+
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'w+') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp, path)
@@ -0,0 +1,166 @@
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+trace_env = 'AUTOPATCH_TRACE'
+
+
+def env_mode():
+    """
+    the mode set with AUTOPATCH_TRACE: '' when off, such as for '0' or
+    'false', 'profile' or any other value to trace
+    """
+    mode = os.environ.get(trace_env, '').strip().lower()
+    return '' if mode in ['', '0', 'false', 'no', 'off'] else mode
+
+
+class Tracer:
+    """
+    Record the time spent in every machine state and external command.
+
+    Results are written as a Chrome trace-event file (load it with
+    chrome://tracing or https://ui.perfetto.dev) together with a compact
+    text summary.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.out_dir = None
+        self.profiler = None
+        self.origin = time.perf_counter()
+
+    def enable(self, out_dir, profile=False):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.out_dir = out_dir
+        self.origin = time.perf_counter()
+        if profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        atexit.register(self.dump)
+
+    def now(self):
+        return int((time.perf_counter() - self.origin) * 1000000)
+
+    def add(self, name, cat, start, args=None):
+        self.events.append({
+            'name': name,
+            'cat': cat,
+            'ph': 'X',
+            'ts': start,
+            'dur': self.now() - start,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args or {},
+        })
+
+    @contextmanager
+    def span(self, name, cat='state', args=None):
+        if not self.enabled:
+            yield args
+            return
+        args = args if args is not None else {}
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.add(name, cat, start, args)
+
+    def command(self, cmd):
+        return self.span(cmd_name(cmd), 'cmd', {'cmd': cmd})
+
+    def summary(self):
+        states = {}
+        cmds = {}
+        for e in self.events:
+            table = states if e['cat'] == 'state' else cmds
+            item = table.setdefault(e['name'], [0, 0, 0, 0])
+            item[0] += 1
+            item[1] += e['dur']
+            item[2] = max(item[2], e['dur'])
+            if e['args'].get('code'):
+                item[3] += 1
+
+        lines = []
+        for (title, table) in (('state', states), ('command', cmds)):
+            lines.append('%-40s %6s %10s %10s %6s' % (
+                title, 'count', 'total(ms)', 'max(ms)', 'fail'))
+            items = sorted(table.items(), key=lambda x: -x[1][1])
+            for (name, (count, total, longest, fail)) in items:
+                lines.append('%-40s %6d %10.1f %10.1f %6d' % (
+                    name[:40], count, total / 1000, longest / 1000, fail))
+            lines.append('')
+        return '\n'.join(lines)
+
+    def dump(self):
+        if not self.enabled or not self.events and not self.profiler:
+            return
+        self.enabled = False
+        if not os.path.exists(self.out_dir):
+            os.makedirs(self.out_dir)
+        base = os.path.join(self.out_dir, time.strftime('%Y%m%d-%H%M%S'))
+
+        with open(base + '.json', 'w+') as f:
+            f.write(json.dumps({'traceEvents': self.events,
+                                'displayTimeUnit': 'ms'}))
+        summary = self.summary()
+        detail = ''
+
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(base + '.prof')
+            s = io.StringIO()
+            pstats.Stats(self.profiler, stream=s) \
+                .sort_stats('cumulative').print_stats(25)
+            detail = s.getvalue()
+
+        with open(base + '.txt', 'w+') as f:
+            f.write(summary + detail)
+        sys.stderr.write('%s\ntrace saved to %s.json\n' % (summary, base))
+
+
+class TracedPopen(subprocess.Popen):
+    """
+    Popen that records its lifetime, from spawn to the first successful
+    wait(), as a command event.
+    """
+
+    def __init__(self, name, *args, **kwargs):
+        self.trace_name = name
+        self.trace_start = tracer.now()
+        super().__init__(*args, **kwargs)
+
+    def wait(self, timeout=None):
+        code = super().wait(timeout)
+        if tracer.enabled and self.trace_name:
+            tracer.add(cmd_name(self.trace_name), 'cmd', self.trace_start,
+                       {'cmd': self.trace_name, 'code': code})
+            self.trace_name = None
+        return code
+
+
+def cmd_name(cmd):
+    """
+    Short name of a shell command used to aggregate events, such as
+    'git add' or 'checkpatch.pl'.
+    """
+    words = cmd.split()
+    if not words:
+        return cmd
+    name = os.path.basename(words[0])
+    if name == 'git' and len(words) > 1:
+        name += ' ' + words[1]
+    return name
+
+
+tracer = Tracer()
@@ -0,0 +1,217 @@
+import shutil
+import sys
+
+try:
+    from dialog import Dialog
+except ImportError:
+    Dialog = None
+
+backends = ['dialog', 'ansi']
+
+
+def ansi_clear():
+    """
+    clear the screen with ANSI escapes, instead of forking 'clear'
+    """
+    if sys.stdout.isatty():
+        sys.stdout.write('\033[H\033[2J\033[3J')
+        sys.stdout.flush()
+
+
+class DialogUI:
+    """
+    Widgets drawn by the dialog program through pythondialog. The Dialog is
+    created on first use, so that headless runs work on hosts without the
+    dialog program.
+    """
+
+    def __init__(self):
+        self.dialog = None
+
+    @staticmethod
+    def available():
+        return Dialog is not None and shutil.which('dialog') is not None
+
+    def __getattr__(self, name):
+        if not self.dialog:
+            if not Dialog:
+                print('pythondialog is not installed!')
+                exit(1)
+            self.dialog = Dialog(autowidgetsize=True)
+        return getattr(self.dialog, name)
+
+    @staticmethod
+    def clear():
+        ansi_clear()
+
+
+class AnsiUI:
+    """
+    Widgets implemented with plain terminal prompts inside the autopatch
+    process, so no program is forked for each of them. The return values
+    follow pythondialog.
+    """
+
+    OK = 'ok'
+    CANCEL = 'cancel'
+    ESC = 'esc'
+    EXTRA = 'extra'
+
+    bold = '\033[1m%s\033[0m'
+
+    def __init__(self):
+        self.out = sys.stdout
+
+    def write(self, text):
+        self.out.write(text)
+        self.out.flush()
+
+    def title(self, text, title=''):
+        title and self.write(self.bold % title + '\n')
+        text and self.write(text.rstrip('\n') + '\n')
+
+    def ask(self, prompt, default=''):
+        try:
+            answer = input(prompt)
+        except EOFError:
+            return None
+        return answer.strip() or default
+
+    @staticmethod
+    def clear():
+        ansi_clear()
+
+    def infobox(self, text, **kwargs):
+        self.write(text + '\n')
+        return self.OK
+
+    def msgbox(self, text, **kwargs):
+        self.title(text, kwargs.get('title', ''))
+        self.ask('[Enter] ')
+        return self.OK
+
+    def yesno(self, text, **kwargs):
+        self.title(text, kwargs.get('title', ''))
+        answer = self.ask('[Y/n] ', 'y')
+        if answer is None or answer.lower() not in ['y', 'yes']:
+            return self.CANCEL
+        return self.OK
+
+    def scrollbox(self, text, extra_button=False, extra_label='', **kwargs):
+        self.title(text, kwargs.get('title', ''))
+        prompt = '[Enter] OK'
+        if extra_button:
+            prompt += ', [e] %s' % extra_label
+        answer = self.ask(prompt + ', [q] quit: ')
+        if answer is None or answer == 'q':
+            return self.CANCEL
+        if extra_button and answer == 'e':
+            return self.EXTRA
+        return self.OK
+
+    def inputbox(self, text, init='', **kwargs):
+        self.title(text, kwargs.get('title', ''))
+        answer = self.ask('%s> ' % ('[%s] ' % init if init else ''), init)
+        if answer is None:
+            return self.CANCEL, ''
+        return self.OK, answer
+
+    def editbox_str(self, init_contents, **kwargs):
+        self.title(init_contents, kwargs.get('title', ''))
+        self.write('(one item per line, an empty line to finish, '
+                   '"." to keep the text above)\n')
+        lines = []
+        while True:
+            line = self.ask('> ')
+            if line is None:
+                return self.CANCEL, ''
+            if line == '.' and not lines:
+                return self.OK, init_contents
+            if not line:
+                break
+            lines.append(line)
+        return self.OK, '\n'.join(lines)
+
+    def menu(self, text, choices=(), **kwargs):
+        self.title(text, kwargs.get('title', ''))
+        for i in range(len(choices)):
+            self.write('%3d) %-20s %s\n' % (i + 1, choices[i][0],
+                                            choices[i][1]))
+        while True:
+            answer = self.ask('number or name, [q] quit: ')
+            if answer is None or answer in ['', 'q']:
+                return self.CANCEL, ''
+            tags = [c[0] for c in choices]
+            if answer in tags:
+                return self.OK, answer
+            if answer.isdigit() and 0 < int(answer) <= len(choices):
+                return self.OK, tags[int(answer) - 1]
+
+    def checklist(self, text, choices=(), extra_button=False,
+                  extra_label='', **kwargs):
+        selected = [c[0] for c in choices if c[2]]
+        prompt = 'numbers to toggle, [Enter] done'
+        if extra_button:
+            prompt += ', [e] %s' % extra_label
+        prompt += ', [q] quit: '
+
+        while True:
+            self.title(text, kwargs.get('title', ''))
+            for i in range(len(choices)):
+                self.write('%3d) [%s] %-40s %s\n' % (
+                    i + 1, 'x' if choices[i][0] in selected else ' ',
+                    choices[i][0], choices[i][1]))
+            answer = self.ask(prompt)
+            if answer is None or answer == 'q':
+                return self.CANCEL, []
+            if not answer:
+                return self.OK, [c[0] for c in choices if c[0] in selected]
+            if extra_button and answer == 'e':
+                return self.EXTRA, []
+            for i in answer.replace(',', ' ').split():
+                if not i.isdigit() or not 0 < int(i) <= len(choices):
+                    continue
+                tag = choices[int(i) - 1][0]
+                if tag in selected:
+                    selected.remove(tag)
+                else:
+                    selected.append(tag)
+
+    def form(self, text, elements=(), **kwargs):
+        self.title(text, kwargs.get('title', ''))
+        self.write('("-" clears a field)\n')
+        results = []
+        for e in elements:
+            label, item = e[0], e[3]
+            answer = self.ask('%s%s: ' % (label, ' [%s]' % item if item
+                                          else ''), item)
+            if answer is None:
+                return self.CANCEL, []
+            results.append('' if answer == '-' else answer)
+        return self.OK, results
+
+
+class UI:
+    """
+    The user interface used by config.py and machine.py. Calls go to the
+    selected backend, which is created on first use.
+    """
+
+    def __init__(self):
+        self.name = None
+        self.backend = None
+
+    def select(self, name):
+        if name not in backends:
+            print('unknown ui: %s' % name)
+            exit(1)
+        self.name = name
+        self.backend = None
+
+    def __getattr__(self, name):
+        if not self.backend:
+            self.name = self.name or 'dialog'
+            if self.name == 'dialog' and not DialogUI.available():
+                self.name = 'ansi'
+            self.backend = DialogUI() if self.name == 'dialog' else AnsiUI()
+        return getattr(self.backend, name)
@@ -0,0 +1,198 @@
+import os
+import shlex
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+
+from config import patch_path
+from git import git
+
+# results of a patch against upstream
+CLEAN = 'clean'
+THREE_WAY = 'needs-3way'
+CONFLICT = 'conflicts'
+SKIPPED = 'skipped'
+MISSING = 'missing'
+
+closed_status = ['finish', 'applied']
+
+
+def open_units(commits):
+    """
+    the open patches to check: a list for each group, in order, and one
+    for each single patch
+    """
+    groups = {}
+    units = []
+    for c in commits:
+        if c.get('status') in closed_status or not c.get('patch'):
+            continue
+        if c['group']:
+            if c['group'] not in groups:
+                groups[c['group']] = []
+                units.append(groups[c['group']])
+            groups[c['group']].append(c)
+        else:
+            units.append([c])
+    for unit in units:
+        unit.sort(key=lambda x: x['order'])
+    return units
+
+
+def resolve(ref):
+    return git.git_cmd_str('git rev-parse --verify -q "%s^{commit}"' % ref)
+
+
+def default_ref():
+    return git.git_cmd_str('git rev-parse --abbrev-ref @{upstream}')
+
+
+def apply_cached(index, patch):
+    """
+    apply a patch to a temporary index, falling back to a 3-way merge
+    :return: the result, such as CLEAN
+    """
+    env = 'GIT_INDEX_FILE="%s" ' % index
+    code, msg = git.git_cmd(env + 'git apply --cached "%s"' % patch)
+    if code == 0:
+        return CLEAN, ''
+    code, msg = git.git_cmd(env + 'git apply --cached -3 "%s"' % patch)
+    if code == 0:
+        return THREE_WAY, msg
+    return CONFLICT, msg
+
+
+def check_unit(base, unit, index=None):
+    """
+    apply the patches of a unit one after another on a temporary index of
+    the base, without touching the working tree
+    :param index: the index file to use, a temporary one by default
+    :return: list of (commit, result, message)
+    """
+    tmp = None
+    if not index:
+        tmp = TemporaryDirectory()
+        index = os.path.join(tmp.name, 'index')
+    results = []
+    try:
+        code, msg = git.git_cmd('GIT_INDEX_FILE="%s" git read-tree %s' %
+                                (index, base))
+        if code != 0:
+            return [(c, CONFLICT, msg) for c in unit]
+
+        blocked = False
+        for c in unit:
+            patch = patch_path(c['patch'])
+            if blocked:
+                results.append((c, SKIPPED, ''))
+                continue
+            if not os.path.exists(patch):
+                results.append((c, MISSING, ''))
+                continue
+            res, msg = apply_cached(index, patch)
+            results.append((c, res, msg))
+            blocked = res == CONFLICT
+    finally:
+        tmp and tmp.cleanup()
+    return results
+
+
+def check(base, units, jobs=None):
+    """
+    check the units in parallel, each on its own temporary index
+    :return: list of (commit, result, message), in the order of units
+    """
+    jobs = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max(1, min(jobs, len(units)))) as pool:
+        return [r for results in pool.map(lambda u: check_unit(base, u),
+                                          units)
+                for r in results]
+
+
+def commit_patch(index, parent, patch):
+    """
+    commit the tree of the index on top of parent, with the author and the
+    message of the patch
+    :return: the new commit
+    """
+    tmp = TemporaryDirectory()
+    try:
+        msg_file = os.path.join(tmp.name, 'msg')
+        code, info = git.git_cmd('git mailinfo "%s" /dev/null < "%s"' %
+                                 (msg_file, patch))
+        if code != 0:
+            return None
+        info = dict(i.split(': ', 1) for i in info.splitlines() if ': ' in i)
+        with open(msg_file, 'r') as f:
+            body = f.read()
+        with open(msg_file, 'w') as f:
+            f.write('%s\n\n%s' % (info.get('Subject', ''), body))
+
+        tree = git.git_cmd_str('GIT_INDEX_FILE="%s" git write-tree' % index)
+        if not tree:
+            return None
+        env = ' '.join('%s=%s' % (k, shlex.quote(info.get(v, '')))
+                       for (k, v) in [('GIT_AUTHOR_NAME', 'Author'),
+                                      ('GIT_AUTHOR_EMAIL', 'Email'),
+                                      ('GIT_AUTHOR_DATE', 'Date')])
+        return git.git_cmd_str('%s git commit-tree %s -p %s -F "%s"' % (
+            env, tree, parent, msg_file))
+    finally:
+        tmp.cleanup()
+
+
+def rebase_unit(base, unit):
+    """
+    rebase the patches of a unit onto base with a temporary index, and
+    regenerate their patch files. The working tree and the branches are
+    not touched.
+    :return: list of (commit, result, message)
+    """
+    tmp = TemporaryDirectory()
+    index = os.path.join(tmp.name, 'index')
+    results = []
+    try:
+        code, msg = git.git_cmd('GIT_INDEX_FILE="%s" git read-tree %s' %
+                                (index, base))
+        if code != 0:
+            return [(c, CONFLICT, msg) for c in unit]
+
+        parent = base
+        for c in unit:
+            patch = patch_path(c['patch'])
+            if parent is None:
+                results.append((c, SKIPPED, ''))
+                continue
+            if not os.path.exists(patch):
+                results.append((c, MISSING, ''))
+                parent = None
+                continue
+            res, msg = apply_cached(index, patch)
+            sha = res != CONFLICT and commit_patch(index, parent, patch)
+            if not sha:
+                results.append((c, CONFLICT, msg))
+                parent = None
+                continue
+            code, data = git.git_cmd('git format-patch -1 --stdout %s' % sha)
+            if code != 0:
+                results.append((c, CONFLICT, data))
+                parent = None
+                continue
+            with open(patch, 'w') as f:
+                f.write(data + '\n')
+            results.append((c, res, msg))
+            parent = sha
+    finally:
+        tmp.cleanup()
+    return results
+
+
+def rebase(base, units, jobs=None):
+    """
+    rebase the units in parallel
+    :return: list of (commit, result, message), in the order of units
+    """
+    jobs = jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max(1, min(jobs, len(units)))) as pool:
+        return [r for results in pool.map(lambda u: rebase_unit(base, u),
+                                          units)
+                for r in results]
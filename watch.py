@@ -0,0 +1,214 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import shutil
+import struct
+import time
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+
+import build
+from git import git
+from langs import _
+from machine import Commit
+
+# seconds without any change before the checks run
+debounce = 1.0
+# seconds between two looks at the tree when inotify is not available
+poll_interval = 2.0
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+watch_mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | \
+    IN_CREATE | IN_DELETE
+event_header = struct.Struct('iIII')
+
+
+class Inotify:
+    """
+    Watch all the directories of a tree with inotify, through the libc with
+    ctypes. The dot directories, such as .git, are left out.
+    """
+
+    def __init__(self, root, skip=()):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self.skip = set(os.path.abspath(i) for i in skip if i)
+        self.dirs = {}
+        self.add_tree(root)
+
+    def add_dir(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                         watch_mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in [errno.ENOSPC, errno.ENOMEM]:
+                # out of watches, see fs.inotify.max_user_watches
+                raise OSError(err, os.strerror(err))
+            return
+        self.dirs[wd] = path
+
+    def add_tree(self, root):
+        for (path, dirs, files) in os.walk(root):
+            dirs[:] = [d for d in dirs if not d.startswith('.') and
+                       os.path.join(path, d) not in self.skip]
+            self.add_dir(path)
+
+    def read(self):
+        data = os.read(self.fd, 1 << 16)
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, size = event_header.unpack_from(data, pos)
+            pos += event_header.size
+            name = data[pos:pos + size].rstrip(b'\0')
+            pos += size
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and \
+                    wd in self.dirs and not name.startswith(b'.'):
+                self.add_tree(os.path.join(self.dirs[wd], os.fsdecode(name)))
+
+    def wait(self, timeout=None):
+        """
+        :return: whether something changed in the tree within timeout
+        """
+        ready, _w, _x = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        self.read()
+        return True
+
+    def settle(self, seconds):
+        """
+        wait until nothing changed for the given seconds
+        """
+        while self.wait(seconds):
+            pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Poller:
+    """
+    Stand in for Inotify, which just looks at the tree again after a while
+    """
+
+    @staticmethod
+    def wait(timeout=None):
+        time.sleep(poll_interval if timeout is None else timeout)
+        return timeout is None
+
+    @staticmethod
+    def settle(seconds):
+        time.sleep(seconds)
+
+    def close(self):
+        pass
+
+
+def open_watcher(poll=False):
+    if poll:
+        return Poller()
+    try:
+        out_dir = build.settings()['dir']
+        return Inotify(git.git_path, [out_dir and os.path.join(git.git_path,
+                                                               out_dir)])
+    except (OSError, AttributeError) as e:
+        print(_('watch.poll').format(err=e))
+        return Poller()
+
+
+def pending_diffs():
+    """
+    the diffs of the commit being worked on: the changes on top of HEAD,
+    and when HEAD is a patch waiting for 'commit -c', on top of its parent
+    """
+    bases = ['HEAD']
+    if Commit.find_continue(git.get_last_title()):
+        bases.append('HEAD~1')
+    diffs = []
+    with TemporaryDirectory() as tmp:
+        env = intent_index(os.path.join(tmp, 'index'))
+        for base in bases:
+            code, diff = git.git_cmd('%sgit diff %s' % (env, base))
+            diff = git.diff_of(diff + '\n') if code == 0 else ''
+            diff and diffs.append(diff)
+    return diffs
+
+
+def intent_index(index):
+    """
+    copy the index and add the untracked files to it with git add -N, so
+    that git diff shows the new files which commit will stage
+    :return: the environment to use the copy in a git command
+    """
+    new = [paths[0] for (status, paths) in git.status() if status == '??']
+    path = git.git_cmd_str('git rev-parse --git-path index')
+    if not new or not path:
+        return ''
+    path = os.path.join(git.git_path, path)
+    if os.path.exists(path):
+        shutil.copyfile(path, index)
+    env = 'GIT_INDEX_FILE="%s" ' % index
+    with NamedTemporaryFile('w+t') as tmp:
+        tmp.write('\0'.join(new))
+        tmp.flush()
+        code, msg = git.git_cmd(
+            '%sgit --literal-pathspecs add -N --pathspec-from-file="%s" '
+            '--pathspec-file-nul' % (env, tmp.name))
+    return env if code == 0 else ''
+
+
+def precompute(diff):
+    """
+    fill the caches used by commit, the maintainers and the compile test of
+    the touched files, and run checkpatch on the diff as an early warning
+    """
+    start = time.time()
+    with NamedTemporaryFile('w+t', suffix='.patch') as tmp:
+        tmp.write(diff)
+        tmp.flush()
+        git.get_maintainers([tmp.name], [diff])
+    code, msg = git.checkpatch_diff(diff)
+    files = build.diff_files(diff)
+    failed = build.test(files) if build.enabled() else []
+    print(_('watch.ready').format(
+        files=len(files), seconds=time.time() - start,
+        checkpatch='ok' if code == 0 else 'errors',
+        build='off' if not build.enabled() else
+        'errors' if failed else 'ok'))
+
+
+def run(poll=False, once=False, seconds=None):
+    """
+    precompute the checks of the pending change whenever it changes, until
+    interrupted
+    :param once: precompute the current change and return
+    """
+    seconds = debounce if seconds is None else seconds
+    watcher = None if once else open_watcher(poll)
+    seen = set()
+    try:
+        while True:
+            diffs = pending_diffs()
+            for diff in diffs:
+                if diff not in seen:
+                    precompute(diff)
+            seen = set(diffs)
+            if once:
+                return
+            watcher.wait()
+            watcher.settle(seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher and watcher.close()